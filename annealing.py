@@ -0,0 +1,178 @@
+from typing import Dict, Any, Optional
+from occupancy import OccupancyIndex, UNARY_SCOPES
+import math
+import random
+import time
+
+_MISSING = object()
+
+
+class ScheduleAnnealer:
+    """
+    Anytime improvement of a feasible timetable against the solver's preference score.
+    Simulated annealing over two feasible move types: relocating one section to
+    another value of its domain, and swapping the values of two sections. Only the
+    moved sections are re-scored, and the temperature cools geometrically over the
+    time budget. improve() returns the best-scoring assignment seen, which is
+    always feasible. It stops before the budget is spent once every section holds
+    its best-scoring value, or after `patience` rounds of 200 proposals without a
+    new best.
+
+    solver is the csp.CSP that produced (or could have produced) the assignment:
+    its domains, constraints and get_value_score define the neighbourhood and objective.
+    """
+
+    def __init__(self, solver, seed: Optional[int] = None,
+                 initial_temperature: float = 50.0,
+                 final_temperature: float = 0.5,
+                 swap_probability: float = 0.3,
+                 patience: int = 100):
+        self.solver = solver
+        self.rng = random.Random(seed)
+        self.initial_temperature = initial_temperature
+        self.final_temperature = final_temperature
+        self.swap_probability = swap_probability
+        self.patience = patience
+
+        self.unary = [c for c in solver.generic_constraints if getattr(c, "scope", None) in UNARY_SCOPES]
+        self.generic = [c for c in solver.generic_constraints if getattr(c, "scope", None) not in UNARY_SCOPES]
+        self.candidates: Dict[str, list] = {}  # Filled lazily: domain values passing the unary constraints
+        self.candidate_sets: Dict[str, set] = {}
+        self.var_ids: list = []
+        self.occupancy = None
+        self.scores: Dict[str, float] = {}
+        self.moves_tried = 0
+        self.moves_accepted = 0
+
+    def values_for(self, var_id: str) -> list:
+        values = self.candidates.get(var_id)
+        if values is None:
+            values = self.candidates[var_id] = [
+                value for value in self.solver.domains[var_id]
+                if all(c({var_id: value}, var_id, value) for c in self.unary)
+            ]
+            self.candidate_sets[var_id] = set(values)
+        return values
+
+    def allows(self, var_id: str, value: Any) -> bool:
+        self.values_for(var_id)
+        return value in self.candidate_sets[var_id]
+
+    def fits(self, assignment: Dict[str, Any], var_id: str, value: Any) -> bool:
+        """Whether var_id=value is legal given the rest of the assignment. var_id must be lifted."""
+        for scope in self.solver.indexed_scopes:
+            if self.occupancy.conflicts(var_id, value, scope):
+                return False
+        if self.generic:
+            previous = assignment.get(var_id, _MISSING)
+            assignment[var_id] = value
+            ok = all(c(assignment, var_id, value) for c in self.generic)
+            if previous is _MISSING:
+                del assignment[var_id]
+            else:
+                assignment[var_id] = previous
+            return ok
+        return True
+
+    def move(self, assignment: Dict[str, Any], var_id: str, value: Any):
+        self.occupancy.unassign(var_id, assignment[var_id])
+        assignment[var_id] = value
+        self.occupancy.assign(var_id, value)
+
+    def propose_relocate(self, assignment: Dict[str, Any]):
+        """Returns (score delta, [(var_id, new value)]) or None if the move is illegal."""
+        var_id = self.rng.choice(self.var_ids)
+        values = self.values_for(var_id)
+        if len(values) < 2:
+            return None
+        current = assignment[var_id]
+        value = self.rng.choice(values)
+        if value == current:
+            return None
+        self.occupancy.unassign(var_id, current)
+        ok = self.fits(assignment, var_id, value)
+        self.occupancy.assign(var_id, current)
+        if not ok:
+            return None
+        return self.solver.get_value_score(var_id, value) - self.scores[var_id], [(var_id, value)]
+
+    def propose_swap(self, assignment: Dict[str, Any]):
+        a, b = self.rng.sample(self.var_ids, 2)
+        value_a, value_b = assignment[a], assignment[b]
+        if value_a == value_b or not self.allows(a, value_b) or not self.allows(b, value_a):
+            return None
+        # Check a at b's value with b lifted, then b at a's value with a already there
+        self.occupancy.unassign(a, value_a)
+        self.occupancy.unassign(b, value_b)
+        ok = self.fits(assignment, a, value_b)
+        if ok:
+            self.occupancy.assign(a, value_b)
+            assignment[a] = value_b
+            ok = self.fits(assignment, b, value_a)
+            assignment[a] = value_a
+            self.occupancy.unassign(a, value_b)
+        self.occupancy.assign(a, value_a)
+        self.occupancy.assign(b, value_b)
+        if not ok:
+            return None
+        score = self.solver.get_value_score
+        delta = score(a, value_b) + score(b, value_a) - self.scores[a] - self.scores[b]
+        return delta, [(a, value_b), (b, value_a)]
+
+    def improve(self, assignment: Dict[str, Any], time_budget: float) -> Dict[str, Any]:
+        if time_budget <= 0 or len(assignment) < 2:
+            return assignment
+
+        current = dict(assignment)
+        self.var_ids = list(current)
+        self.occupancy = OccupancyIndex(self.solver.vars_by_id)
+        for var_id, value in current.items():
+            self.occupancy.assign(var_id, value)
+        self.scores = {var_id: self.solver.get_value_score(var_id, value) for var_id, value in current.items()}
+
+        total = start_total = sum(self.scores.values())
+        best, best_total = current, total
+        at_best = True  # Snapshot lazily: only copy before leaving a best state
+        # No assignment scores above every section at its top-scoring domain value
+        ceiling = sum(float(self.solver.value_score_array(var_id).max()) for var_id in self.var_ids)
+        stale_rounds = 0
+
+        start = time.time()
+        cooling = math.log(self.final_temperature / self.initial_temperature)
+        while True:
+            elapsed = time.time() - start
+            if elapsed >= time_budget or best_total >= ceiling - 1e-9 or stale_rounds >= self.patience:
+                break
+            round_best = best_total
+            temperature = self.initial_temperature * math.exp(cooling * elapsed / time_budget)
+
+            # A few hundred proposals per clock read
+            for _ in range(200):
+                self.moves_tried += 1
+                if self.rng.random() < self.swap_probability:
+                    proposal = self.propose_swap(current)
+                else:
+                    proposal = self.propose_relocate(current)
+                if proposal is None:
+                    continue
+                delta, changes = proposal
+                if delta < 0 and self.rng.random() >= math.exp(delta / temperature):
+                    continue
+
+                if at_best and delta < 0:
+                    best = dict(current)
+                self.moves_accepted += 1
+                for var_id, value in changes:
+                    self.move(current, var_id, value)
+                    self.scores[var_id] = self.solver.get_value_score(var_id, value)
+                total += delta
+                # Equal-score states count as best too, so plateau moves never need a copy
+                at_best = total >= best_total - 1e-9
+                best_total = max(best_total, total)
+            stale_rounds = stale_rounds + 1 if best_total <= round_best + 1e-9 else 0
+
+        if at_best:
+            best = current
+        self.solver.log(f"Annealing: preference score {start_total:.1f} -> {best_total:.1f} of {ceiling:.1f} "
+                        f"({self.moves_accepted}/{self.moves_tried} moves accepted, {time.time() - start:.1f}s).")
+        return best
@@ -0,0 +1,125 @@
+from dataclasses import dataclass
+from typing import Dict, Optional
+import time
+
+PHASES = ("preprocessing", "search", "improvement", "diagnosis")
+# Phases covered by the overall time limit (the solver's timeout_seconds)
+TIMED_PHASES = ("preprocessing", "search")
+
+
+@dataclass
+class BudgetResult:
+    """Why and where a solver run stopped early, with the work done so far."""
+    phase: str
+    reason: str  # "time", "nodes" or "checks"
+    elapsed: float
+    nodes: int
+    checks: int
+
+    def message(self) -> str:
+        return (f"Budget exhausted ({self.reason}) during {self.phase} after {self.elapsed:.1f}s, "
+                f"{self.nodes} nodes, {self.checks} checks")
+
+
+class BudgetExhausted(TimeoutError):
+    """Raised by SolverBudget. Subclasses TimeoutError so existing timeout handlers still apply."""
+
+    def __init__(self, result: BudgetResult):
+        super().__init__(result.message())
+        self.result = result
+
+
+class SolverBudget:
+    """
+    Work and time limits for a solver run.
+    node() and check() only bump counters; the monotonic clock is read once every
+    `clock_every` operations, so a deadline costs almost nothing per check.
+    That interval starts small and adapts so that clock reads land roughly every
+    `clock_interval` seconds, whether a check costs a microsecond (search) or a millisecond (diagnosis).
+    The overall time limit runs from start() across preprocessing and search.
+    Any phase can also have its own limit in phase_limits (seconds, keyed by a
+    name from PHASES); where both apply the tighter one wins.
+    """
+
+    def __init__(self, time_limit: Optional[float] = None,
+                 phase_limits: Optional[Dict[str, float]] = None,
+                 max_nodes: Optional[int] = None,
+                 max_checks: Optional[int] = None,
+                 clock_every: int = 1,
+                 clock_interval: float = 0.01):
+        self.time_limit = time_limit
+        self.phase_limits = phase_limits or {}
+        self.max_nodes = max_nodes
+        self.max_checks = max_checks
+        self.clock_every = clock_every
+        self.clock_interval = clock_interval
+
+        self.started: Optional[float] = None
+        self.phase = None
+        self.deadline: Optional[float] = None
+        self.nodes = 0
+        self.checks = 0
+        self.countdown = clock_every
+        self.last_clock = 0.0
+
+    def start(self):
+        self.started = time.monotonic()
+        self.nodes = 0
+        self.checks = 0
+        self.enter("preprocessing")
+
+    def enter(self, phase: str):
+        """Switches to a phase and recomputes the deadline. Checks the clock straight away."""
+        if self.started is None:
+            self.start()
+        now = time.monotonic()
+        self.phase = phase
+        deadlines = []
+        if self.time_limit is not None and phase in TIMED_PHASES:
+            deadlines.append(self.started + self.time_limit)
+        if phase in self.phase_limits:
+            deadlines.append(now + self.phase_limits[phase])
+        self.deadline = min(deadlines) if deadlines else None
+        self.countdown = self.clock_every
+        self.last_clock = now
+        if self.deadline is not None and now > self.deadline:
+            self.exhausted("time")
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left in the current phase, or None if it has no deadline."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started if self.started is not None else 0.0
+
+    def node(self):
+        self.nodes += 1
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            self.exhausted("nodes")
+        self.tick()
+
+    def check(self):
+        self.checks += 1
+        if self.max_checks is not None and self.checks > self.max_checks:
+            self.exhausted("checks")
+        self.tick()
+
+    def tick(self):
+        self.countdown -= 1
+        if self.countdown <= 0:
+            now = time.monotonic()
+            # Shrink or double the interval to keep clock reads about clock_interval apart
+            gap = now - self.last_clock
+            if gap > self.clock_interval:
+                self.clock_every = max(1, int(self.clock_every * self.clock_interval / gap))
+            elif gap < self.clock_interval / 2 and self.clock_every < 65536:
+                self.clock_every *= 2
+            self.countdown = self.clock_every
+            self.last_clock = now
+            if self.deadline is not None and now > self.deadline:
+                self.exhausted("time")
+
+    def exhausted(self, reason: str):
+        raise BudgetExhausted(BudgetResult(self.phase, reason, self.elapsed(), self.nodes, self.checks))
@@ -1,9 +1,76 @@
-from typing import Dict, List, Tuple, Any
+import bisect
+from typing import Dict, List, Tuple, Any, Iterable, Optional
 from data_model import Lecturer, Room, Course, ClassSection, TimeSlot
+from constraints import BlockIndex
+from domains import FactoredDomain
 
 Domain = Dict[str, List[Any]] # A mapping from entity type to list of entities e.g section_id -> List of (day, slot, room_id)
 
-def build_domain(data: dict) -> Domain:
+
+def intern(table: dict, slots: Iterable[tuple], rooms: Iterable[str], excluded: Iterable[tuple] = ()) -> FactoredDomain:
+    """The FactoredDomain for these factors, shared through `table` with every section that has the same ones."""
+    key = (tuple(slots), tuple(rooms), frozenset(excluded))
+    domain = table.get(key)
+    if domain is None:
+        domain = table[key] = FactoredDomain(*key)
+    return domain
+
+
+# Departmental groups and the room-id substrings that mark their rooms
+DEPARTMENT_ROOM_TAGS = {"CS": ("CS", "LAB"), "Nursing": ("CH",), "Theology": ("BULLEY",)}
+
+
+class RoomCatalog:
+    """
+    The room lookups domain building repeats for every section, computed once per run:
+    the reserved (special) room ids, the non-reserved pool in rooms.csv order, each
+    departmental group's ordering of that pool (its tagged rooms first, then the rest),
+    and the pool sorted largest first, so the rooms seating a class are a bisect away.
+    """
+
+    def __init__(self, rooms: Dict[str, Room], special_rooms: dict = None):
+        self.rooms = rooms
+        self.reserved = set()
+        for info in (special_rooms or {}).values():
+            r_name = info['room'] if isinstance(info, dict) else info
+            self.reserved.add(r_name.replace(" ", "_"))
+        self.available = [r for r in rooms.values() if r.id not in self.reserved]
+
+        self.by_department: Dict[str, List[Room]] = {}
+        for group, tags in DEPARTMENT_ROOM_TAGS.items():
+            tagged = [r for r in self.available if any(tag in r.id.upper() for tag in tags)]
+            if tagged:
+                tagged_ids = {r.id for r in tagged}
+                self.by_department[group] = tagged + [r for r in self.available if r.id not in tagged_ids]
+
+        self.largest_first = sorted(self.available, key=lambda r: r.capacity, reverse=True)
+        self._negated_capacities = [-r.capacity for r in self.largest_first]  # Ascending, for bisect
+        self._fitting: Dict[tuple, List[Room]] = {}
+
+    @staticmethod
+    def department_tags(room: Room) -> Tuple[bool, ...]:
+        upper = room.id.upper()
+        return tuple(any(tag in upper for tag in tags) for tags in DEPARTMENT_ROOM_TAGS.values())
+
+    def ordered(self, group: Optional[str] = None) -> List[Room]:
+        """The pool in the group's priority order (rooms.csv order for other groups)."""
+        return self.by_department.get(group, self.available)
+
+    def fitting(self, group: Optional[str], enrollment: int) -> List[Room]:
+        """ordered(group) restricted to rooms seating `enrollment`, kept per capacity cut-off."""
+        cut = bisect.bisect_right(self._negated_capacities, -enrollment)
+        key = (group if group in self.by_department else None, cut)
+        fitting = self._fitting.get(key)
+        if fitting is None:
+            fits = {r.id for r in self.largest_first[:cut]}
+            fitting = self._fitting[key] = [r for r in self.ordered(group) if r.id in fits]
+        return fitting
+
+    def largest(self, count: int) -> List[Room]:
+        return self.largest_first[:count]
+
+
+def build_domain(data: dict, blocked_blocks: list = None) -> Domain:
     config = data['config']
     lecturers : Dict[str, Lecturer] = data['lecturers']
     rooms : Dict[str, Room] = data['rooms']
@@ -14,27 +81,25 @@ def build_domain(data: dict) -> Domain:
     slots_per_day = config['slots_per_day']  # e.g., 8 slots
     slots_per_day = config['slots_per_day']  # e.g., 8 slots
     domains : Domain = {}
+    # Domains are FactoredDomains (time slots x rooms), interned so sections with the
+    # same rooms share one; values are only generated when the solver reads them
+    table = {}
+    time_slots = [(day, slot_start) for day in range(len(days)) for slot_start in range(slots_per_day)
+                  if is_valid_config_slot(day, slot_start, days, slots_per_day)]
     
     # Check if strict capacity is enabled in config
     strict_capacity = config.get('strict_capacity', False)
     print(f"[INFO] Strict Capacity Check: {'ENABLED' if strict_capacity else 'DISABLED'}")
     
     special_rooms = data.get('special_rooms', {})
-    # Pre-calculate ID set for fast lookup to easily check if a room is reserved
-    reserved_room_ids = set()
-    for info in special_rooms.values():
-         if isinstance(info, dict):
-             r_name = info['room']
-         else:
-             r_name = info
-         reserved_room_ids.add(r_name.replace(" ", "_"))
+    catalog = RoomCatalog(rooms, special_rooms)
 
     for sec in sections:
         
         #Pre-schedule locking remains a Hard Constraint
         if sec.fixed_day is not None and sec.fixed_slot is not None:
             req_room_id = sec.requested_room if sec.requested_room else next((iter(rooms)))
-            domains[sec.id] = [(sec.fixed_day, sec.fixed_slot, req_room_id)]
+            domains[sec.id] = intern(table, [(sec.fixed_day, sec.fixed_slot)], [req_room_id])
             continue
         
         # lecturer = lecturers[sec.lecturer_id]
@@ -59,16 +124,13 @@ def build_domain(data: dict) -> Domain:
                 # Case 1: Both day AND time are specified (strictest constraint)
                 if forced_day is not None and forced_slot is not None:
                     print(f"[INFO] Locking {sec.course_code} to day {forced_day} ({days[forced_day]}) at slot {forced_slot} in {target_room_name}")
-                    domains[sec.id] = [(forced_day, forced_slot, target_room_id)]
+                    domains[sec.id] = intern(table, [(forced_day, forced_slot)], [target_room_id])
                     continue  # Skip all other logic
                 
                 # Case 2: Only time slot specified (any day, specific time)
                 elif forced_slot is not None:
                     print(f"[DEBUG] Forcing {sec.course_code} into {target_room_name} at slot {forced_slot}")
-                    values = []
-                    for day in range(len(days)):
-                        values.append((day, forced_slot, target_room_id))
-                    domains[sec.id] = values
+                    domains[sec.id] = intern(table, [(day, forced_slot) for day in range(len(days))], [target_room_id])
                     continue  # Skip standard logic
                 
                 # Case 3: Only room specified (standard special room)
@@ -79,62 +141,68 @@ def build_domain(data: dict) -> Domain:
         else:
             # Rule 2: Normal Course -> CANNOT use reserved rooms
             # AND: Prioritize departmental rooms
-            
-            # 1. Start with all non-reserved rooms
-            all_available = [r for r in rooms.values() if r.id not in reserved_room_ids]
-            
-            # 2. Filter by Departmental Priority
+            # The catalog orders the non-reserved pool with the group's departmental
+            # rooms first (the general pool follows, so a full department can spill
+            # over; CSP explores domains in order). With strict capacity, only the
+            # rooms that seat the class.
             grp = sec.departmental_group
-            dept_priority_rooms = []
-            
-            if grp == "CS":
-                dept_priority_rooms = [r for r in all_available if "CS" in r.id.upper() or "LAB" in r.id.upper()]
-            elif grp == "Nursing":
-                dept_priority_rooms = [r for r in all_available if "CH" in r.id.upper()]
-            elif grp == "Theology":
-                dept_priority_rooms = [r for r in all_available if "BULLEY" in r.id.upper()]
-            
-            # 3. If prioritized rooms exist, use them as primary domain. 
-            # Otherwise (or if empty), use the general pool.
-            if dept_priority_rooms:
-                candidate_rooms = dept_priority_rooms
-                # We add the general pool as secondary options to ensure we don't fail if dept rooms are full
-                # Optimization: CSP explores domains in order.
-                other_rooms = [r for r in all_available if r.id not in [dr.id for dr in dept_priority_rooms]]
-                candidate_rooms += other_rooms
+            if strict_capacity:
+                candidate_rooms = catalog.fitting(grp, sec.enrollment)
             else:
-                candidate_rooms = all_available
+                candidate_rooms = catalog.ordered(grp)
 
             # --- Handle Requested Room overrides ---
             if sec.requested_room:
                  r_id = sec.requested_room.replace(" ", "_")
-                 if r_id in rooms and r_id not in reserved_room_ids:
+                 if r_id in rooms and r_id not in catalog.reserved and \
+                    (not strict_capacity or rooms[r_id].capacity >= sec.enrollment):
                       # Put requested room at the very front of the candidate list
                       candidate_rooms = [rooms[r_id]] + [r for r in candidate_rooms if r.id != r_id]
             
             # --- NEW: Optional Capacity Check ---
-            if strict_capacity:
-                original_count = len(candidate_rooms)
-                candidate_rooms = [r for r in candidate_rooms if r.capacity >= sec.enrollment]
-                
-                if not candidate_rooms and original_count > 0:
-                    print(f"[WARNING] No rooms large enough for {sec.course_code} (Size: {sec.enrollment}). Relaxing capacity constraint.")
-                    candidate_rooms = sorted(all_available, key=lambda x: x.capacity, reverse=True)[:3]
+            if strict_capacity and not candidate_rooms and catalog.available:
+                print(f"[WARNING] No rooms large enough for {sec.course_code} (Size: {sec.enrollment}). Relaxing capacity constraint.")
+                candidate_rooms = catalog.largest(3)
             # ------------------------------------
             
-        values : List[Tuple[int, TimeSlot, str]] = []
-        
       #Soft Constraints
       #Instead of filtering by lecturer availability, we iterate over all possible time slots
       #This allows the solver or AI to use  'unavailable' slots as a last resort if no other options exist.
-        for day, _ in enumerate(days):
-            for slot_start in range(slots_per_day):
-                if is_valid_config_slot(day,slot_start, days, slots_per_day):
-                    for room in candidate_rooms:
-                        values.append((day, slot_start, room.id))
-        domains[sec.id] = values
+        domains[sec.id] = intern(table, time_slots, [room.id for room in candidate_rooms])
+
+    # General-schedule blocks are static, so their values are dropped here once
+    # instead of being checked during search
+    if blocked_blocks:
+        blocks = BlockIndex(blocked_blocks)
+        removed = 0
+        for sec in sections:
+            values = blocks.filter(sec, domains[sec.id], rooms)
+            removed += len(domains[sec.id]) - len(values)
+            domains[sec.id] = intern(table, *values.key())
+        print(f"[INFO] General schedule blocks removed {removed} candidate slots.")
     return domains
 
+def room_equivalence_classes(data: dict, blocked_blocks: list = None) -> Dict[str, tuple]:
+    """
+    Groups rooms that build_domain treats identically: same capacity, room type,
+    departmental tags (the same name tests build_domain uses) and reservation status.
+    The solver tries one room per class and (day, slot) instead of every room.
+    Rooms named in the general schedule's blocks are checked individually by the
+    constraints, so each of them stays in a class of its own.
+    """
+    rooms : Dict[str, Room] = data['rooms']
+    
+    catalog = RoomCatalog(rooms, data.get('special_rooms', {}))
+    blocked_names = {block.get('room') for block in (blocked_blocks or []) if block.get('room')}
+    
+    classes = {}
+    for room in rooms.values():
+        if room.name in blocked_names:
+            classes[room.id] = ("blocked", room.id)
+            continue
+        classes[room.id] = (room.capacity, room.room_type, catalog.department_tags(room), room.id in catalog.reserved)
+    return classes
+
 def is_valid_config_slot(day, slot_start, total_days,slots_per_day):
     day_name = total_days[day]
     
@@ -160,14 +228,21 @@ def build_exam_domain(data: dict) -> Domain:
     slots_per_day = 2 # Morning and Afternoon
     
     domains : Domain = {}
+    table = {}  # Shared FactoredDomains, as in build_domain
+    time_slots = []
+    for day in range(exam_days):
+        for slot in range(slots_per_day):
+            # Day 5 is Saturday? Day 6 Sunday? 
+            # Let's assume standard Mon-Fri logic or just continuous days.
+            # If we exclude weekends, we need a calendar mapping. 
+            # For now, we assume continuous exam days excluding Sundays if needed.
+            # Let's simple skip every 7th day (Sunday) if starting Mon.
+            if (day % 7) == 6: continue # Skip Sundays
+            time_slots.append((day, slot))
     
-    # Pre-calculate reserved rooms
+    # Reserved rooms and capacity order, computed once
     special_rooms = data.get('special_rooms', {})
-    reserved_room_ids = set()
-    for info in special_rooms.values():
-         if isinstance(info, dict): r_name = info['room']
-         else: r_name = info
-         reserved_room_ids.add(r_name.replace(" ", "_"))
+    catalog = RoomCatalog(rooms, special_rooms)
 
     for sec in sections:
         candidate_rooms = []
@@ -186,28 +261,13 @@ def build_exam_domain(data: dict) -> Domain:
             # Rule 2: Use All Available Rooms (Exams often use all halls)
             # Prioritize larger rooms? For now, standard logic.
             # strict_capacity is CRITICAL for exams.
-            all_available = [r for r in rooms.values() if r.id not in reserved_room_ids]
-            
             # Filter by capacity (Strict for exams to avoid overcrowding)
-            candidate_rooms = [r for r in all_available if r.capacity >= sec.enrollment]
+            candidate_rooms = catalog.fitting(None, sec.enrollment)
             
             # If no room big enough, find largest available
             if not candidate_rooms:
-                candidate_rooms = sorted(all_available, key=lambda x: x.capacity, reverse=True)[:3]
-
-        values = []
-        for day in range(exam_days):
-            for slot in range(slots_per_day):
-                # Day 5 is Saturday? Day 6 Sunday? 
-                # Let's assume standard Mon-Fri logic or just continuous days.
-                # If we exclude weekends, we need a calendar mapping. 
-                # For now, we assume continuous exam days excluding Sundays if needed.
-                # Let's simple skip every 7th day (Sunday) if starting Mon.
-                if (day % 7) == 6: continue # Skip Sundays
-
-                for room in candidate_rooms:
-                    values.append((day, slot, room.id))
-        
-        domains[sec.id] = values
+                candidate_rooms = catalog.largest(3)
+
+        domains[sec.id] = intern(table, time_slots, [room.id for room in candidate_rooms])
         
     return domains
@@ -0,0 +1,96 @@
+from typing import Dict, List, Iterable, Tuple
+from data_model import ClassSection
+from occupancy import _semester
+
+# Scopes whose clashes depend only on which sections share a (day, slot), never on the room
+GRAPH_SCOPES = ("lecturer", "cohort", "exam_level", "custom")
+
+
+def _code(code) -> str:
+    return str(code).strip().upper()
+
+
+class ConflictGraph:
+    """
+    Static graph of the sections that may never share a (day, slot): the same
+    lecturer, a cohort in an overlapping semester, the same exam level and semester
+    (exam mode), or a custom conflict pair of course codes. Built once per problem.
+
+    Sections are numbered in input order, and each one's neighbours are a Python int
+    bitset in adjacency, so "does X clash with anyone in this slot" is a single AND
+    with the bits of the slot's occupants (see bits()).
+    """
+
+    def __init__(self, sections: Dict[str, ClassSection], scopes: Iterable[str],
+                 custom_pairs: Iterable[Tuple[str, str]] = ()):
+        self.ids = list(sections)
+        self.bit = {var_id: 1 << i for i, var_id in enumerate(self.ids)}
+        scopes = set(scopes)
+
+        # Members of each group as one bitset
+        lecturers: Dict[str, int] = {}
+        levels: Dict[tuple, int] = {}
+        cohorts: Dict[str, Dict[str, int]] = {}  # cohort -> {semester or None: bits}
+        codes: Dict[str, int] = {}
+        for var_id, sec in sections.items():
+            bit = self.bit[var_id]
+            lecturers[sec.lecturer_id] = lecturers.get(sec.lecturer_id, 0) | bit
+            level = (str(sec.course_level), str(sec.semester))
+            levels[level] = levels.get(level, 0) | bit
+            for cohort in sec.cohorts:
+                by_sem = cohorts.setdefault(cohort, {})
+                by_sem[_semester(sec)] = by_sem.get(_semester(sec), 0) | bit
+            codes[_code(sec.course_code)] = codes.get(_code(sec.course_code), 0) | bit
+        cohort_bits = {cohort: _union(by_sem.values()) for cohort, by_sem in cohorts.items()}
+
+        partners: Dict[str, set] = {}
+        if "custom" in scopes:
+            for first, second in custom_pairs:
+                partners.setdefault(_code(first), set()).add(_code(second))
+                partners.setdefault(_code(second), set()).add(_code(first))
+
+        self.adjacency: Dict[str, int] = {}
+        for var_id, sec in sections.items():
+            adjacent = 0
+            if "lecturer" in scopes:
+                adjacent |= lecturers[sec.lecturer_id]
+            if "exam_level" in scopes:
+                adjacent |= levels[(str(sec.course_level), str(sec.semester))]
+            if "cohort" in scopes:
+                sem = _semester(sec)
+                for cohort in sec.cohorts:
+                    by_sem = cohorts[cohort]
+                    if sem is None:
+                        # Unknown semester clashes with the whole cohort
+                        adjacent |= cohort_bits[cohort]
+                    else:
+                        adjacent |= by_sem.get(sem, 0) | by_sem.get(None, 0)
+            for code in partners.get(_code(sec.course_code), ()):
+                adjacent |= codes.get(code, 0)
+            self.adjacency[var_id] = adjacent & ~self.bit[var_id]
+
+    def members(self, bits: int) -> List[str]:
+        """The section ids in a bitset, in input order."""
+        ids = []
+        while bits:
+            low = bits & -bits
+            ids.append(self.ids[low.bit_length() - 1])
+            bits ^= low
+        return ids
+
+    def neighbours(self, var_id: str) -> List[str]:
+        return self.members(self.adjacency[var_id])
+
+    def bits(self, var_ids: Iterable[str]) -> int:
+        return _union(self.bit[var_id] for var_id in var_ids)
+
+    def clashes(self, var_id: str, occupants: int) -> bool:
+        """True if any section in the occupants bitset may not share a slot with var_id."""
+        return bool(self.adjacency[var_id] & occupants)
+
+
+def _union(bitsets: Iterable[int]) -> int:
+    result = 0
+    for bits in bitsets:
+        result |= bits
+    return result
@@ -1,4 +1,7 @@
-from typing import List, Dict, Tuple, Any
+from abc import ABC, abstractmethod
+from typing import List, Dict, Tuple, Any, Optional
+import numpy as np
+from domains import FactoredDomain
 from data_model import ClassSection
 
 Constraint = Dict[str, Any]  # A mapping from constraint type to its parameters
@@ -30,6 +33,8 @@ def no_room_conflict(assignment: Dict[str, Any],
             return False
     return True
 
+no_room_conflict.scope = "room"
+
 
 def no_student_cohort_conflict(assignment: Dict[str, Any], 
                                 var_id: str,
@@ -63,9 +68,10 @@ def no_student_cohort_conflict(assignment: Dict[str, Any],
             this_sem = sections[var_id].semester
             other_sem = sections[other_id].semester
             
-            # If both have semesters defined and they are DIFFERENT, then NO CONFLICT.
+            # If both have semesters defined and they are DIFFERENT, then NO CONFLICT
+            # with this section - keep checking the rest of the assignment.
             if this_sem and other_sem and this_sem != other_sem:
-                 return True # Safe, different semesters
+                 continue # Safe, different semesters
             
             if common:
                 # OPTIMIZATION:
@@ -121,32 +127,6 @@ def no_blocked_slot_conflict(assignment: Dict[str, Any],
                    
     return True
 
-def make_constraints(sections: list,  rooms: dict, preference_model: dict = None, blocked_blocks: list = None):
-    sections_by_id = {sec.id: sec for sec in sections}
-
-    def lecturer_conflict_wrapper(assignment, var_id, value):
-        return no_lecturer_conflict(assignment, var_id, value, sections_by_id)
-    
-    def cohort_conflict_wrapper(assignment, var_id, value):
-        return no_student_cohort_conflict(assignment, var_id, value, sections_by_id)
-        
-    def blocked_slot_wrapper(assignment, var_id, value):
-        if not blocked_blocks: return True
-        return no_blocked_slot_conflict(assignment, var_id, value, sections_by_id, blocked_blocks, rooms)
-    
-    base_constraints = [
-        lecturer_conflict_wrapper,
-        no_room_conflict,
-        cohort_conflict_wrapper
-    ]
-    
-    if blocked_blocks:
-        base_constraints.append(blocked_slot_wrapper)
-        
-    return base_constraints
-
-
-
 def no_exam_level_clash(assignment: Dict[str, Any], 
                         var_id: str,
                         value : Any,
@@ -174,17 +154,270 @@ def no_exam_level_clash(assignment: Dict[str, Any],
                     return False
     return True
 
+def no_custom_conflict(assignment: Dict[str, Any],
+                       var_id: str,
+                       value : Any,
+                       sections: Dict[str, ClassSection],
+                       partners: Dict[str, set]) -> bool:
+    """
+    Course pairs flagged as conflicting in user feedback (the trained model's
+    custom_conflicts) are never scheduled at the same time.
+    partners maps each course code to the codes it must not meet.
+    """
+    day, slot, _ = value
+    these = partners.get(sections[var_id].course_code.strip().upper())
+    if not these:
+        return True
+    for other_id, other_val in assignment.items():
+        if other_id == var_id:
+            continue
+        other_day, other_slot, _ = other_val
+        if day == other_day and slot == other_slot and sections[other_id].course_code.strip().upper() in these:
+            return False
+    return True
+
+
+# --- Declarative constraints ---
+# The functions above scan the whole assignment for every check and stay as the
+# reference implementation. The classes below wrap them: calling one still runs
+# the reference check, and its scope tells the solvers which index or conflict
+# graph answers it instead. Unary constraints also have filter_domain(), which
+# strikes every value they forbid from a section's day x slot x room mask at once.
+
+def _clear_slots(domain: np.ndarray, slots) -> np.ndarray:
+    """Clears every room at the given (day, slot) pairs, skipping pairs outside the mask."""
+    if slots:
+        days, periods = np.array(list(slots), dtype=np.intp).reshape(-1, 2).T
+        keep = (days < domain.shape[0]) & (periods < domain.shape[1])
+        domain[days[keep], periods[keep], :] = False
+    return domain
+
+
+def _clear_values(domain: np.ndarray, values, room_index: Dict[str, int]) -> np.ndarray:
+    """Clears the given (day, slot, room_id) values, skipping rooms and slots outside the mask."""
+    cells = [(day, slot, room_index[room_id]) for day, slot, room_id in values if room_id in room_index]
+    if cells:
+        days, periods, rooms = np.array(cells, dtype=np.intp).T
+        keep = (days < domain.shape[0]) & (periods < domain.shape[1])
+        domain[days[keep], periods[keep], rooms[keep]] = False
+    return domain
+
+
+class SectionConstraint(ABC):
+    """
+    One constraint family with a declared scope (see occupancy.INDEXED_SCOPES,
+    UNARY_SCOPES and conflict_graph.GRAPH_SCOPES); constraint(assignment, var_id, value)
+    is the reference check. Placements live in the solver's own indexes, so a
+    constraint holds no per-run state.
+    """
+    scope: Optional[str] = None
+    name = "constraint"
+
+    def __init__(self, sections: Dict[str, ClassSection]):
+        self.sections = sections
+
+    def __repr__(self):
+        # Diagnosis reports group failures by this name
+        return self.name
+
+    @abstractmethod
+    def __call__(self, assignment: Dict[str, Any], var_id: str, value: Any) -> bool:
+        ...
+
+
+class LecturerConflict(SectionConstraint):
+    """A lecturer teaches one section per (day, slot)."""
+    scope = "lecturer"
+    name = "lecturer_conflict"
+
+    def __call__(self, assignment, var_id, value):
+        return no_lecturer_conflict(assignment, var_id, value, self.sections)
+
+
+class RoomConflict(SectionConstraint):
+    """A room holds one section per (day, slot)."""
+    scope = "room"
+    name = "no_room_conflict"
+
+    def __call__(self, assignment, var_id, value):
+        return no_room_conflict(assignment, var_id, value)
+
+
+class CohortConflict(SectionConstraint):
+    """
+    Sections sharing a student cohort never meet at the same time, unless both
+    name a semester and the semesters differ.
+    """
+    scope = "cohort"
+    name = "cohort_conflict"
+
+    def __call__(self, assignment, var_id, value):
+        return no_student_cohort_conflict(assignment, var_id, value, self.sections)
+
+
+class ExamLevelConflict(SectionConstraint):
+    """Exams of the same level and semester never share a (day, slot)."""
+    scope = "exam_level"
+    name = "exam_level_conflict"
+
+    def __call__(self, assignment, var_id, value):
+        return no_exam_level_clash(assignment, var_id, value, self.sections)
+
+
+class BlockIndex:
+    """
+    General-schedule blocks (load_data.load_general_schedule_blocks) indexed by
+    (day, slot): the room names blocked there, and the course levels then semesters
+    blocked there, each with the course codes that hold the block. A block never
+    applies to its own course. Blocks are static for a run, so a check is a few
+    dictionary lookups instead of a walk over every block; the rules are those of
+    no_blocked_slot_conflict.
+    """
+
+    def __init__(self, blocked_blocks: List[dict]):
+        self.rooms: Dict[tuple, Dict[str, set]] = {}  # (day, slot) -> {room name: {code or None}}
+        self.levels: Dict[tuple, Dict[Any, Dict[Optional[str], set]]] = {}  # (day, slot) -> {level: {semester: codes}}
+        for block in blocked_blocks or ():
+            day_slot = (block['day'], block['slot'])
+            code = block.get('code') or None
+            if block.get('room'):
+                self.rooms.setdefault(day_slot, {}).setdefault(block['room'], set()).add(code)
+            by_sem = self.levels.setdefault(day_slot, {}).setdefault(block['level'], {})
+            by_sem.setdefault(block['semester'], set()).add(code)
+        self.slots = set(self.rooms) | set(self.levels)
+
+    @staticmethod
+    def _applies(codes, course_code) -> bool:
+        return any(code is None or code != course_code for code in codes)
+
+    def slot_blocked(self, sec: ClassSection, day: int, slot: int) -> bool:
+        """True if the section's level and semester are blocked at (day, slot), whatever the room."""
+        by_sem = self.levels.get((day, slot), {}).get(str(sec.course_level))
+        if not by_sem:
+            return False
+        if sec.semester is None:
+            return any(self._applies(codes, sec.course_code) for codes in by_sem.values())
+        return any(self._applies(by_sem.get(sem, ()), sec.course_code) for sem in (None, str(sec.semester)))
+
+    def rooms_blocked(self, sec: ClassSection, day: int, slot: int) -> List[str]:
+        """Names of the rooms blocked for the section at (day, slot)."""
+        return [name for name, codes in self.rooms.get((day, slot), {}).items()
+                if self._applies(codes, sec.course_code)]
+
+    def allows(self, sec: ClassSection, value: Any, rooms: Dict[str, Any]) -> bool:
+        day, slot, room_id = value
+        if (day, slot) not in self.slots:
+            return True
+        room_name = rooms[room_id].name if room_id in rooms else None
+        if room_name and room_name in self.rooms_blocked(sec, day, slot):
+            return False
+        return not self.slot_blocked(sec, day, slot)
+
+    def filter(self, sec: ClassSection, values: List[Any], rooms: Dict[str, Any]) -> List[Any]:
+        """
+        The values the blocks leave open to the section, in their original order.
+        A FactoredDomain stays factored: blocked slots leave its time mask and
+        blocked rooms become exclusions.
+        """
+        if not isinstance(values, FactoredDomain):
+            return [value for value in values if self.allows(sec, value, rooms)]
+        slots, excluded = [], []
+        for day, slot in self.slots:
+            if not values.has_slot(day, slot):
+                continue
+            if self.slot_blocked(sec, day, slot):
+                slots.append((day, slot))
+                continue
+            names = self.rooms_blocked(sec, day, slot)
+            excluded.extend((day, slot, room_id) for room_id in values.rooms
+                            if room_id in rooms and rooms[room_id].name and rooms[room_id].name in names)
+        return values.restrict(slots, excluded)
+
+
+class BlockedSlotConflict(SectionConstraint):
+    """
+    Periods reserved by the general schedule: a section may not use a blocked room,
+    nor a slot its level and semester are blocked in, unless the block is its own
+    course. filter_domain(section, domain, room_index) clears the blocked values from a
+    day x slot x room bool mask (rooms numbered by room_index) in place and returns it.
+    builder.build_domain already drops these values when given the blocks.
+    """
+    scope = "blocked"
+    name = "blocked_slot_conflict"
+
+    def __init__(self, sections: Dict[str, ClassSection], blocked_blocks: List[dict], rooms: Dict[str, Any]):
+        super().__init__(sections)
+        self.blocked_blocks = blocked_blocks
+        self.rooms = rooms
+        self.index = BlockIndex(blocked_blocks)
+        self.room_ids_by_name: Dict[str, List[str]] = {}
+        for room_id, room in rooms.items():
+            if room.name:
+                self.room_ids_by_name.setdefault(room.name, []).append(room_id)
+
+    def __call__(self, assignment, var_id, value):
+        return no_blocked_slot_conflict(assignment, var_id, value, self.sections, self.blocked_blocks, self.rooms)
+
+    def filter_domain(self, section: ClassSection, domain: np.ndarray, room_index: Dict[str, int]) -> np.ndarray:
+        slots, values = [], []
+        for day, slot in self.index.slots:
+            if self.index.slot_blocked(section, day, slot):
+                slots.append((day, slot))
+                continue
+            for name in self.index.rooms_blocked(section, day, slot):
+                values.extend((day, slot, room_id) for room_id in self.room_ids_by_name.get(name, ()))
+        _clear_values(domain, values, room_index)
+        return _clear_slots(domain, slots)
+
+
+class CustomConflict(SectionConstraint):
+    """
+    Course pairs from the trained model's custom_conflicts ({(code, code): weight})
+    never share a (day, slot). The pairs are static, so the CSP folds them into its
+    conflict graph (see conflict_graph.py) together with the lecturer and cohort clashes.
+    """
+    scope = "custom"
+    name = "custom_conflict"
+
+    def __init__(self, sections: Dict[str, ClassSection], custom_conflicts: Dict[tuple, Any]):
+        super().__init__(sections)
+        self.pairs = list(custom_conflicts)
+        self.partners: Dict[str, set] = {}
+        for first, second in self.pairs:
+            first, second = str(first).strip().upper(), str(second).strip().upper()
+            self.partners.setdefault(first, set()).add(second)
+            self.partners.setdefault(second, set()).add(first)
+
+    def __call__(self, assignment, var_id, value):
+        return no_custom_conflict(assignment, var_id, value, self.sections, self.partners)
+
+
+def make_constraints(sections: list, rooms: dict, preference_model: dict = None, blocked_blocks: list = None):
+    sections_by_id = {sec.id: sec for sec in sections}
+
+    # Scope tags let the CSP answer these checks from its occupancy index
+    # instead of scanning the whole assignment (see occupancy.py).
+    base_constraints = [
+        LecturerConflict(sections_by_id),
+        RoomConflict(sections_by_id),
+        CohortConflict(sections_by_id),
+    ]
+
+    if blocked_blocks:
+        base_constraints.append(BlockedSlotConflict(sections_by_id, blocked_blocks, rooms))
+
+    custom_conflicts = (preference_model or {}).get("custom_conflicts")
+    if custom_conflicts:
+        base_constraints.append(CustomConflict(sections_by_id, custom_conflicts))
+
+    return base_constraints
+
+
 def make_exam_constraints(sections: list, rooms: dict):
     sections_by_id = {sec.id: sec for sec in sections}
 
-    def lecturer_conflict_wrapper(assignment, var_id, value):
-        return no_lecturer_conflict(assignment, var_id, value, sections_by_id)
-    
-    def exam_level_conflict_wrapper(assignment, var_id, value):
-        return no_exam_level_clash(assignment, var_id, value, sections_by_id)
-    
     return [
-        lecturer_conflict_wrapper,
-        no_room_conflict,
-        exam_level_conflict_wrapper
+        LecturerConflict(sections_by_id),
+        RoomConflict(sections_by_id),
+        ExamLevelConflict(sections_by_id),
     ]
@@ -1,5 +1,14 @@
-from typing import List, Dict, Tuple, Any, Callable, Optional
+from typing import List, Dict, Tuple, Any, Callable, Optional, Union
 from data_model import ClassSection, Lecturer
+from occupancy import OccupancyIndex, INDEXED_SCOPES, UNARY_SCOPES
+from conflict_graph import ConflictGraph, GRAPH_SCOPES
+from domains import DomainGrid, MRVQueue, FactoredDomain
+from nogoods import NogoodStore
+from annealing import ScheduleAnnealer
+from budget import SolverBudget, BudgetExhausted, BudgetResult
+from solver_log import SolverLog
+import numpy as np
+import logging
 import random
 from datetime import datetime
 import time
@@ -8,6 +17,25 @@ Assignment = Dict[str, Any]  # A mapping from variable id to assigned value
 Domain = Dict[str, List[Any]]  # A mapping from variable id to list of possible values
 Constraint = Callable[[Assignment, str, Any], bool]
 
+
+# Added to the score of a preferred value: more than any preference score, so it always comes first
+PREFERRED_BONUS = 10000.0
+
+
+class RestartSearch(Exception):
+    """Raised by the search engine when the current run used up its failure limit."""
+
+
+def luby(i: int) -> int:
+    """The i-th term (1-based) of the Luby sequence: 1, 1, 2, 1, 1, 2, 4, 1, 1, 2, ..."""
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    if i == (1 << k) - 1:
+        return 1 << (k - 1)
+    return luby(i - (1 << (k - 1)) + 1)
+
+
 class CSP:
     def __init__(self, 
                  variables: List[ClassSection],
@@ -17,7 +45,25 @@ class CSP:
                     preferences: Dict = None,
                     progress_callback: Optional[Callable[[str], None]] = None,
                     log_file : str = "csp_log.txt",
-                    timeout_seconds: int = 30):
+                    timeout_seconds: int = 30,
+                    forward_checking: bool = False,
+                    arc_consistency: bool = False,
+                    iterative: bool = True,
+                    backjumping: bool = False,
+                    nogood_capacity: int = 5000,
+                    restarts: bool = False,
+                    restart_schedule: str = "luby",
+                    restart_base: int = 50,
+                    seed: Optional[int] = None,
+                    variable_ordering: str = "mrv",
+                    value_ordering: str = "preference",
+                    improve_seconds: float = 0,
+                    room_classes: Optional[Dict[str, Any]] = None,
+                    phase_budgets: Optional[Dict[str, float]] = None,
+                    max_nodes: Optional[int] = None,
+                    max_checks: Optional[int] = None,
+                    log_level: Union[int, str] = logging.INFO,
+                    preferred_values: Optional[Assignment] = None):
         self.variables = variables
         self.domains = domains
         self.constraints = constraints
@@ -27,26 +73,174 @@ class CSP:
         self.log_file = log_file
         self.timeout_seconds = timeout_seconds
         self.start_time = None
+        # timeout_seconds bounds preprocessing + search; phase_budgets can add per-phase
+        # limits (see budget.PHASES). The clock is only read every few hundred checks.
+        self.budget = SolverBudget(timeout_seconds, phase_budgets, max_nodes, max_checks)
+        self.budget_result: Optional[BudgetResult] = None  # Set when a run stops on its budget
         
         # Optimization: map IDs to sections for O(1) lookup
         self.vars_by_id = {var.id: var for var in variables}
         
+        # Optimization: lecturer/room/cohort checks are answered from a (day, slot)-keyed
+        # occupancy index kept in sync with the assignment in backtrack().
+        # Constraints without a known scope are still called the slow way.
+        self.occupancy = OccupancyIndex(self.vars_by_id)
+        self.indexed_scopes = [c.scope for c in constraints if getattr(c, "scope", None) in INDEXED_SCOPES]
+        self.generic_constraints = [c for c in constraints if getattr(c, "scope", None) not in INDEXED_SCOPES]
+        
+        # Slot-level clashes (lecturer, cohort, exam level and custom course pairs) are
+        # precompiled into a conflict graph: each section's neighbours are an int bitset
+        # and slot_bits holds the placed sections per (day, slot), so checking them is
+        # one AND. Only the room scope is still answered by the occupancy index.
+        custom = [c for c in constraints if getattr(c, "scope", None) == "custom" and hasattr(c, "pairs")]
+        graph_scopes = [scope for scope in self.indexed_scopes if scope in GRAPH_SCOPES] + ["custom"] * bool(custom)
+        self.conflict_graph = ConflictGraph(self.vars_by_id, graph_scopes, [pair for c in custom for pair in c.pairs])
+        self.slot_bits: Dict[Tuple[int, int], int] = {}
+        self.occupancy_scopes = [scope for scope in self.indexed_scopes if scope not in GRAPH_SCOPES]
+        
+        # Live domains: after each assignment the now-illegal values are pruned from
+        # neighbouring sections, so every live domain size is that section's legal-value
+        # count. The MRV queue keeps those counts ordered for select_unassigned_variable.
+        # With forward_checking the branch also fails as soon as a domain empties.
+        # Domains live in a DomainGrid (boolean day x slot x room masks); neighbour and
+        # room-user lists are grid index arrays so pruning runs over all of them at once.
+        self.forward_checking = forward_checking
+        self.live_domains = DomainGrid(domains)
+        grid = self.live_domains
+        # Unary constraints that can filter a whole domain (constraints.SectionConstraint)
+        # clear their values from the grid once, up front, so search never tries them and
+        # is_consistent skips them. Like AC-3 removals, this sits below every trail mark.
+        self.prefiltered = [c for c in self.generic_constraints
+                            if getattr(c, "scope", None) in UNARY_SCOPES and hasattr(c, "filter_domain")]
+        if self.prefiltered:
+            for i, var_id in enumerate(grid.var_ids):
+                for constraint in self.prefiltered:
+                    constraint.filter_domain(self.vars_by_id[var_id], grid.mask[i], grid.room_index)
+            grid.sizes = grid.mask.sum(axis=(1, 2, 3))
+        self.search_constraints = [c for c in self.generic_constraints if c not in self.prefiltered and c not in custom]
+        self.neighbour_sets = {var_id: set(self.conflict_graph.neighbours(var_id)) for var_id in self.vars_by_id}
+        self.neighbours = {var_id: grid.indices(sorted(others, key=grid.var_index.get))
+                           for var_id, others in self.neighbour_sets.items()}
+        # Sections with a value in each room, read off the grid (var x room "any value here")
+        self.room_users: Dict[str, np.ndarray] = {}
+        if "room" in self.indexed_scopes:
+            uses_room = grid.mask.any(axis=(1, 2))
+            for r, room_id in enumerate(grid.room_ids):
+                users = np.flatnonzero(uses_room[:, r])
+                if len(users):
+                    self.room_users[room_id] = users
+        # MRV ties go to the earlier section; "mrv_degree" puts sections with more
+        # lecturer/cohort neighbours first among equals.
+        if variable_ordering not in ("mrv", "mrv_degree"):
+            raise ValueError(f"Unknown variable ordering: {variable_ordering}")
+        order = [var.id for var in variables]
+        if variable_ordering == "mrv_degree":
+            order.sort(key=lambda var_id: -len(self.neighbour_sets[var_id]))
+        self.mrv_queue = MRVQueue(order, grid.size)
+        grid.on_change = self.mrv_queue.push
+        
+        # Room symmetry (room_classes from builder.room_equivalence_classes): rooms of the
+        # same class whose domain columns are identical are interchangeable, so once a
+        # section's subtree fails in one of them at some (day, slot), its twins there are
+        # skipped for as long as their occupancy pattern matches (see symmetric_value).
+        self.room_class: Dict[str, int] = {}
+        if room_classes and "room" in self.indexed_scopes:
+            class_ids: Dict[tuple, int] = {}
+            for r, room_id in enumerate(grid.room_ids):
+                key = (room_classes.get(room_id, room_id), np.packbits(grid.mask[..., r]).tobytes())
+                self.room_class[room_id] = class_ids.setdefault(key, len(class_ids))
+        self.day_slots = [(day, slot) for day in range(grid.shape[0]) for slot in range(grid.shape[1])]
+        self.symmetry_skips = 0
+        
+        # Optional AC-3 pass over the pairwise relations before search starts
+        self.arc_consistency = arc_consistency
+        self.ac3_removed = 0
+        
+        # Explicit-stack search by default; the recursive engine can hit RecursionError
+        # on a few thousand sections.
+        self.iterative = iterative
+        
+        # Conflict-directed backjumping (iterative engine only): conflict_sets[X] collects
+        # the culprits behind X's failed values, and explain_pruned() names the placements
+        # that pruned the rest of X's domain. A dead end jumps straight back to the latest
+        # culprit and records the culprits' placements as a nogood.
+        if backjumping and not iterative:
+            raise ValueError("Backjumping requires the iterative search engine")
+        self.backjumping = backjumping
+        self.nogoods = NogoodStore(capacity=nogood_capacity)
+        self.conflict_sets: Dict[str, set] = {}
+        self.depth: Dict[str, int] = {}
+        self.slot_holders: Dict[Tuple[int, int], List[str]] = {}  # (day, slot) -> placed sections
+        self.room_holders: Dict[Any, str] = {}  # (day, slot, room_id) -> placed section
+        self.domain_slots: Dict[str, Dict[Tuple[int, int], List[str]]] = {}
+        if backjumping:
+            shared: Dict[int, Dict[Tuple[int, int], List[str]]] = {}
+            for var_id, values in domains.items():
+                if isinstance(values, FactoredDomain):
+                    # Interned domains share one map, built from the factors
+                    by_slot = shared.get(id(values))
+                    if by_slot is None:
+                        by_slot = shared[id(values)] = values.rooms_by_slot()
+                    self.domain_slots[var_id] = by_slot
+                    continue
+                by_slot = self.domain_slots[var_id] = {}
+                for day, slot, room_id in values:
+                    by_slot.setdefault((day, slot), []).append(room_id)
+        self.wiped_out_var: Optional[str] = None
+        # Failures of untagged constraints can't be traced to a culprit, so they blame
+        # every placed section (chronological backtracking). Unary ones blame nobody.
+        self.generic_is_unary = all(getattr(c, "scope", None) in UNARY_SCOPES for c in self.search_constraints)
+        self.backjump_count = 0
+        
+        # Randomized restarts: each run may fail restart_base * luby(run) times (or a
+        # geometric 1.5x growth) before the search starts over with re-seeded tie-breaking.
+        # Learned nogoods and AC-3 removals carry over between runs.
+        if restarts and not iterative:
+            raise ValueError("Restarts require the iterative search engine")
+        if restart_schedule not in ("luby", "geometric"):
+            raise ValueError(f"Unknown restart schedule: {restart_schedule}")
+        self.restarts = restarts
+        self.restart_schedule = restart_schedule
+        self.restart_base = restart_base
+        self.seed = seed
+        self.rng = random.Random(seed)
+        # "preference": highest get_value_score first with a little noise; "random": noise only
+        if value_ordering not in ("preference", "random"):
+            raise ValueError(f"Unknown value ordering: {value_ordering}")
+        self.value_ordering = value_ordering
+        self.value_scores: Dict[str, np.ndarray] = {}
+        # Values to try first whatever their score, e.g. last run's placements when repairing (repair.py)
+        self.preferred_values = preferred_values or {}
+        self.reset_value_order()
+        self.failure_limit: Optional[int] = None
+        self.run_failures = 0
+        self.restart_count = 0
+        
         self.iteration_count = 0
         
-        #Initialize logging
-        with open(self.log_file, 'w') as f:
-            f.write(f"----AI Solver Session Started at {datetime.now()}----\n")
-    
-    def log(self, message: str, is_error: bool = False):
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        prefix = "[ERROR]" if is_error else "[INFO]"
-        log_message = f"{timestamp} {prefix} {message}\n"
+        # Anytime phase: after the first feasible timetable, spend up to improve_seconds
+        # annealing it towards a higher get_value_score total (see annealing.py)
+        self.improve_seconds = improve_seconds
         
-        with open(self.log_file, 'a') as f:
-            f.write(log_message + "\n")
+        # Anytime result: the deepest partial assignment seen, returned by solve(allow_partial=True)
+        # on timeout. It is copied lazily, when the search first backs out of that depth.
+        self.best_partial: Assignment = {}
+        self.best_depth = 0
+        self.best_pending = False  # The current assignment is the deepest and has not been copied
+        self.unplaced: Dict[str, str] = {}  # Section id -> why it is not in the returned partial assignment
+        # With allow_partial, sections with no values left before search starts are set
+        # aside (kept out of selection and pruning) so they don't stop the search at depth 0
+        self.set_aside: List[str] = []
+        self.search_mark: Optional[int] = None  # Trail mark where search started; diagnose() undoes to it
         
-        if self.progress_callback:
-            self.progress_callback(log_message)
+        # Initialize logging: writes happen on a background thread (see solver_log.py)
+        self.log_sink = SolverLog(log_file, level=log_level, progress_callback=progress_callback,
+                                  header=f"----AI Solver Session Started at {datetime.now()}----")
+    
+    def log(self, message: str, is_error: bool = False, level: Optional[int] = None):
+        if level is None:
+            level = logging.ERROR if is_error else logging.INFO
+        self.log_sink.write(level, message)
     
     def get_value_score(self, var_id: str, value: Any) -> float:
         """
@@ -55,110 +249,601 @@ class CSP:
         """
         day_id, slot_id, room_id = value
         sec = self.vars_by_id[var_id]
-        lecturer = self.lecturers.get(sec.lecturer_id)
-        
+        return self.slot_score(sec, day_id, slot_id) + self.room_score(sec, room_id)
+    
+    def slot_score(self, sec: ClassSection, day_id: int, slot_id: int) -> float:
+        """The part of get_value_score that depends on the time."""
         score = 0.0
+        lecturer = self.lecturers.get(sec.lecturer_id)
         if lecturer and (day_id, slot_id) in lecturer.available_time_slots:
             score += 100.0 
         
-        # Additional scoring based on preferences can be added here
         if self.preferences:
             l_key = (sec.lecturer_id.replace("_", " "), day_id, slot_id)
             score += self.preferences.get("lecturer_time_preferences", {}).get(l_key, 0) * 5.0
-            r_key = (sec.course_code, room_id)
-            score += self.preferences.get("course_room_preferences", {}).get(r_key, 0) * 2.0
         return score
     
+    def room_score(self, sec: ClassSection, room_id: str) -> float:
+        """The part of get_value_score that depends on the room."""
+        if not self.preferences:
+            return 0.0
+        r_key = (sec.course_code, room_id)
+        return self.preferences.get("course_room_preferences", {}).get(r_key, 0) * 2.0
+    
+    def value_score_array(self, var_id: str) -> np.ndarray:
+        """get_value_score for every value in var_id's domain, computed once per section."""
+        scores = self.value_scores.get(var_id)
+        if scores is None and isinstance(self.domains[var_id], FactoredDomain):
+            # One score per slot plus one per room, summed over the product
+            domain = self.domains[var_id]
+            sec = self.vars_by_id[var_id]
+            slot_scores = np.array([self.slot_score(sec, day_id, slot_id) for day_id, slot_id in domain.slots], dtype=float)
+            room_scores = np.array([self.room_score(sec, room_id) for room_id in domain.rooms], dtype=float)
+            scores = np.add.outer(slot_scores, room_scores).ravel()
+            if domain.excluded:
+                scores = np.delete(scores, [domain.product_index(value) for value in domain.excluded])
+            self.value_scores[var_id] = scores
+        if scores is None:
+            sec = self.vars_by_id[var_id]
+            slot_scores: Dict[Tuple[int, int], float] = {}
+            room_scores: Dict[str, float] = {}
+            for day_id, slot_id, room_id in self.domains[var_id]:
+                if (day_id, slot_id) not in slot_scores:
+                    slot_scores[(day_id, slot_id)] = self.slot_score(sec, day_id, slot_id)
+                if room_id not in room_scores:
+                    room_scores[room_id] = self.room_score(sec, room_id)
+            scores = np.fromiter((slot_scores[(day_id, slot_id)] + room_scores[room_id]
+                                  for day_id, slot_id, room_id in self.domains[var_id]),
+                                 dtype=float, count=len(self.domains[var_id]))
+            self.value_scores[var_id] = scores
+        return scores
+    
     def is_consistent(self, assignment: Assignment, var_id: str, value: Any) -> bool:
-        # Check timeout
-        if time.time() - self.start_time > self.timeout_seconds:
-            self.log(f"Timeout exceeded ({self.timeout_seconds}s). Stopping search.", is_error=True)
-            raise TimeoutError(f"CSP solver timed out after {self.timeout_seconds} seconds")
+        # Counts the check; raises BudgetExhausted once the budget is spent
+        self.budget.check()
+        
+        # Indexed scopes: a bitwise AND against the sections already in this slot, then
+        # constant-time room lookups. Both mirror `assignment`, which must not contain var_id yet.
+        occupants = self.slot_bits.get(value[:2])
+        if occupants and self.conflict_graph.adjacency[var_id] & occupants:
+            return False
+        for scope in self.occupancy_scopes:
+            if self.occupancy.conflicts(var_id, value, scope):
+                return False
+        
+        if not self.search_constraints:
+            return True
         
         # We don't actually add it to the assignment dict here because 
         # the constraints expect the *current* state of the world plus the candidate value.
         # But wait, the constraints.py implementation iterates over assignment.items().
         # So we SHOULD temporarily add it to check.
         assignment[var_id] = value
-        for constraint in self.constraints:
+        for constraint in self.search_constraints:
             if not constraint(assignment, var_id, value):
                 del assignment[var_id]
                 return False
         del assignment[var_id]
         return True
     
-    def select_unassigned_variable(self, assignment: Assignment) -> Optional[str]:
-        unassigned_vars = [var.id for var in self.variables if var.id not in assignment]
-        if not unassigned_vars:
-            return None
-        best_var = None
-        best_score = float('inf')
+    def forward_check(self, assignment: Assignment, var_id: str, value: Any) -> bool:
+        """
+        Prunes values made illegal by var_id=value from unassigned neighbours.
+        Removals go on the live domain trail. Returns False on a domain wipeout;
+        in forward checking mode it stops pruning there, since the branch is dead.
+        """
+        day, slot, room_id = value
+        grid = self.live_domains
+        wiped_out = False
+        self.wiped_out_var = None
         
-        for var_id in unassigned_vars:
-            legal_count = 0
-            for value in self.domains[var_id]:
-                if self.is_consistent(assignment, var_id, value):
-                    legal_count += 1
+        changed = grid.remove_slot(grid.unassigned(self.neighbours[var_id]), day, slot)
+        if len(changed) and not grid.sizes[changed].all():
+            wiped_out = True
+            self.wiped_out_var = grid.var_ids[changed[grid.sizes[changed] == 0][0]]
+            if self.forward_checking:
+                return False
+        
+        users = self.room_users.get(room_id)
+        if users is not None:
+            changed = grid.remove_value(grid.unassigned(users), value)
+            if len(changed) and not grid.sizes[changed].all():
+                wiped_out = True
+                if self.wiped_out_var is None:
+                    self.wiped_out_var = grid.var_ids[changed[grid.sizes[changed] == 0][0]]
+        return not wiped_out
+    
+    def explain_pruned(self, var_id: str) -> set:
+        """
+        Placed sections that rule out var_id's values: for each (day, slot) of its domain,
+        the earliest placed lecturer/cohort neighbour there, otherwise whoever holds each
+        of its rooms. Values with no such holder were either tried (their culprits are in
+        the conflict set) or removed for good by AC-3, which needs no culprit.
+        """
+        culprits = set()
+        neighbours = self.neighbour_sets[var_id]
+        for (day, slot), rooms in self.domain_slots[var_id].items():
+            blockers = [other for other in self.slot_holders.get((day, slot), ()) if other in neighbours]
+            if blockers:
+                culprits.add(min(blockers, key=self.depth.__getitem__))
+                continue
+            for room_id in rooms:
+                holder = self.room_holders.get((day, slot, room_id))
+                if holder is not None:
+                    culprits.add(holder)
+        culprits.discard(var_id)
+        return culprits
+    
+    def propagate_arc_consistency(self, set_aside: bool = False) -> bool:
+        """
+        AC-3 over the lecturer/cohort (same slot) and room (same value) relations.
+        Both are disequalities, so a value only loses its support when the other
+        section is down to a single slot, or a single value for rooms. Singleton
+        domains (fixed sections, locked special rooms) propagate straight away.
+        The removals stay on the trail below any search mark, so they are permanent.
+        Returns False if some domain is wiped out (the problem is infeasible), unless
+        set_aside is given: wiped-out sections are then set aside and propagation goes on.
+        """
+        grid = self.live_domains
+        queue = [var.id for var in self.variables]
+        queued = set(queue)
+        removed = 0
+        
+        while queue:
+            self.budget.check()
+            var_id = queue.pop()
+            queued.discard(var_id)
+            live_slots = grid.live_slots(var_id)
+            if len(live_slots) != 1:
+                continue
+            day, slot = live_slots[0]
             
-            if legal_count < best_score:
-                best_score = legal_count
-                best_var = var_id
+            before = int(grid.sizes.sum())
+            changed = grid.remove_slot(self.neighbours[var_id], day, slot).tolist()
+            rooms = grid.live_rooms(var_id, day, slot)
+            if len(rooms) == 1 and rooms[0] in self.room_users:
+                value = (day, slot, rooms[0])
+                users = self.room_users[rooms[0]]
+                changed += grid.remove_value(users[users != grid.var_index[var_id]], value).tolist()
+            removed += before - int(grid.sizes.sum())
             
-            if best_score == 0:
-                self.log(f"Variable {var_id} has no legal values left.", is_error=True)
-                return var_id
-        return best_var if best_var else unassigned_vars[0]
-    
+            for i in changed:
+                other_id = grid.var_ids[i]
+                if grid.size(other_id) == 0:
+                    if set_aside:
+                        self.set_aside_section(other_id)
+                        continue
+                    self.ac3_removed = removed
+                    sec = self.vars_by_id[other_id]
+                    self.log(f"AC-3: {sec.section_title} has no values left after propagation. Problem is infeasible.", is_error=True)
+                    return False
+                if other_id not in queued:
+                    queued.add(other_id)
+                    queue.append(other_id)
+        
+        self.ac3_removed = removed
+        self.log(f"AC-3 removed {removed} of {sum(len(v) for v in self.domains.values())} domain values before search.")
+        return True
     
-    def backtrack(self, assignment: Assignment) -> Assignment | None:
-        if len(assignment) == len(self.variables):
-            return assignment
+    def set_aside_section(self, var_id: str):
+        """Takes a section with an empty domain out of the search; partial_result() reports it."""
+        if var_id in self.set_aside:
+            return
+        self.set_aside.append(var_id)
+        self.mrv_queue.discard(var_id)
+        self.live_domains.set_assigned(var_id, True)
+        self.log(f"Setting aside {self.vars_by_id[var_id].section_title}: no legal values left before search.", is_error=True)
 
-
-        
+    def select_unassigned_variable(self, assignment: Assignment) -> Optional[str]:
+        # Live domains already exclude everything the indexed constraints forbid,
+        # so the queue's counts are the legal-value counts (MRV).
+        var_id = self.mrv_queue.peek()
+        if var_id is not None and self.live_domains.size(var_id) == 0:
+            self.log(f"Variable {var_id} has no legal values left.", is_error=True)
+        return var_id
+    
+    
+    def order_domain_values(self, var_id: str) -> List[Any]:
+        """
+        The section's values, best score first with seeded noise breaking ties.
+        A value in preferred_values always comes first.
+        Built on the first visit and reused until the next restart; the shared
+        domain lists are never reordered.
+        """
+        order = self.value_order.get(var_id)
+        if order is None:
+            domain_values = self.domains[var_id]
+            if isinstance(domain_values, FactoredDomain):
+                domain_values = domain_values.values()  # Materialized once per shared domain
+            keys = self.noise_rng.uniform(0, 0.1, len(domain_values))
+            if self.value_ordering != "random":
+                keys += self.value_score_array(var_id)
+            preferred = self.preferred_values.get(var_id)
+            if preferred is not None and preferred in domain_values:
+                keys[domain_values.index(preferred)] += PREFERRED_BONUS
+            order = self.value_order[var_id] = [domain_values[i] for i in np.argsort(-keys, kind="stable").tolist()]
+        return order
+    
+    def reset_value_order(self):
+        """Draws fresh tie-breaking noise (from self.rng) for the next search run."""
+        self.noise_rng = np.random.default_rng(self.rng.getrandbits(64))
+        self.value_order: Dict[str, List[Any]] = {}
+    
+    def assign(self, assignment: Assignment, var_id: str, value: Any) -> Tuple[int, bool]:
+        """
+        Places var_id=value and prunes its neighbours.
+        Returns the trail mark to undo to and whether search may continue below it.
+        """
+        assignment[var_id] = value
+        if len(assignment) > self.best_depth:
+            self.best_depth = len(assignment)
+            self.best_pending = True
+        self.occupancy.assign(var_id, value)
+        self.slot_bits[value[:2]] = self.slot_bits.get(value[:2], 0) | self.conflict_graph.bit[var_id]
+        if self.backjumping:
+            self.slot_holders.setdefault(value[:2], []).append(var_id)
+            if self.room_users:
+                self.room_holders[value] = var_id
+        self.mrv_queue.discard(var_id)
+        self.live_domains.set_assigned(var_id, True)
+        mark = self.live_domains.mark()
+        ok = self.forward_check(assignment, var_id, value) or not self.forward_checking
+        return mark, ok
+    
+    def unassign(self, assignment: Assignment, var_id: str, mark: int):
+        self.live_domains.undo(mark)
+        if self.best_pending and len(assignment) == self.best_depth:
+            self.best_partial = dict(assignment)
+            self.best_pending = False
+        value = assignment.pop(var_id)
+        self.occupancy.unassign(var_id, value)
+        self.slot_bits[value[:2]] &= ~self.conflict_graph.bit[var_id]
+        if self.backjumping:
+            self.slot_holders[value[:2]].remove(var_id)
+            if self.room_users:
+                del self.room_holders[value]
+        self.live_domains.set_assigned(var_id, False)
+        self.mrv_queue.add(var_id)
+    
+    def report_progress(self, assignment: Assignment):
+        self.budget.node()
         self.iteration_count += 1
         if self.iteration_count % 50 == 0:
              pct = (len(assignment) / len(self.variables)) * 100
              self.log(f"PROGRESS:{len(assignment)}/{len(self.variables)}|{pct:.1f}")
+    
+    def backtrack(self, assignment: Assignment) -> Assignment | None:
+        """Recursive search: one Python frame per placed section."""
+        if len(assignment) + len(self.set_aside) == len(self.variables):
+            return assignment
+
+        self.report_progress(assignment)
 
         var_id = self.select_unassigned_variable(assignment)
         if var_id is None:
             return None
         
         sec = self.vars_by_id[var_id]
-        domain_values = self.domains[var_id]
-        domain_values.sort(key=lambda val: self.get_value_score(var_id, val) + random.uniform(0, 0.1), reverse=True) 
+        domain_values = self.order_domain_values(var_id)
+        failed_rooms: Dict[tuple, str] = {}
         for value in domain_values:
+            if not self.live_domains.contains(var_id, value):
+                continue
+            if failed_rooms and self.symmetric_value(failed_rooms, var_id, value):
+                continue
             if self.is_consistent(assignment, var_id, value):
-                assignment[var_id] = value
-                result = self.backtrack(assignment)
+                mark, ok = self.assign(assignment, var_id, value)
+                result = self.backtrack(assignment) if ok else None
                 if result is not None:
                     return result
-                del assignment[var_id]
-        self.log(f"REJECTED: Could not place {sec.section_title}. All {len(domain_values)} attempted slots caused conflicts.", is_error=True)
+                self.unassign(assignment, var_id, mark)
+                self.record_failed_room(failed_rooms, value)
+        if self.log_sink.is_enabled(logging.DEBUG):
+            self.log(f"REJECTED: Could not place {sec.section_title}. All {len(domain_values)} attempted slots caused conflicts.", level=logging.DEBUG)
         return None
     
-    def solve(self) -> Assignment | None:
+    def iterative_backtrack(self, assignment: Assignment) -> Assignment | None:
+        """
+        Same search as backtrack() without recursion. Each choice point on the explicit
+        stack is [var_id, ordered values, next value position, trail mark, placed value,
+        failed room classes].
+        Visits values in the same order and consumes the same randomness, so results
+        are identical to the recursive version. With backjumping, a dead end unwinds
+        straight to its latest culprit instead of the previous choice point.
+        """
+        stack = []
+        descend = True
+        
+        while True:
+            if descend:
+                if len(assignment) + len(self.set_aside) == len(self.variables):
+                    return assignment
+                self.report_progress(assignment)
+                var_id = self.select_unassigned_variable(assignment)
+                if var_id is not None:
+                    stack.append([var_id, self.order_domain_values(var_id), 0, None, None, {}])
+                    self.conflict_sets[var_id] = set()
+                    self.depth[var_id] = len(stack) - 1
+            
+            if not stack:
+                return None
+            
+            frame = stack[-1]
+            var_id, domain_values, pos = frame[0], frame[1], frame[2]
+            if frame[4] is not None:
+                # The subtree below the placed value failed
+                self.unassign(assignment, var_id, frame[3])
+                self.record_failed_room(frame[5], frame[4])
+                frame[4] = None
+            
+            descend = False
+            while pos < len(domain_values):
+                value = domain_values[pos]
+                pos += 1
+                if not self.live_domains.contains(var_id, value):
+                    continue
+                if frame[5] and self.symmetric_value(frame[5], var_id, value):
+                    continue
+                if not self.is_consistent(assignment, var_id, value):
+                    if self.backjumping and not self.generic_is_unary:
+                        self.conflict_sets[var_id].update(assignment)
+                    continue
+                if self.backjumping:
+                    culprits = self.nogoods.violated(assignment, var_id, value)
+                    if culprits is not None:
+                        self.conflict_sets[var_id].update(culprits)
+                        continue
+                mark, ok = self.assign(assignment, var_id, value)
+                if ok:
+                    frame[3], frame[4] = mark, value
+                    descend = True
+                    break
+                if self.backjumping and self.wiped_out_var is not None:
+                    self.conflict_sets[var_id].update(self.explain_pruned(self.wiped_out_var))
+                    self.conflict_sets[var_id].discard(var_id)
+                self.unassign(assignment, var_id, mark)
+                self.record_failed_room(frame[5], value)
+            frame[2] = pos
+            
+            if not descend:
+                if self.log_sink.is_enabled(logging.DEBUG):
+                    sec = self.vars_by_id[var_id]
+                    self.log(f"REJECTED: Could not place {sec.section_title}. All {len(domain_values)} attempted slots caused conflicts.", level=logging.DEBUG)
+                stack.pop()
+                if self.backjumping and not self.backjump(assignment, stack, var_id):
+                    return None
+                self.run_failures += 1
+                if self.failure_limit is not None and self.run_failures >= self.failure_limit:
+                    while stack:
+                        frame = stack.pop()
+                        if frame[4] is not None:
+                            self.unassign(assignment, frame[0], frame[3])
+                    raise RestartSearch()
+    
+    def record_failed_room(self, failed_rooms: Dict[tuple, str], value: Any):
+        """Notes that var's subtree failed with this room, for symmetric_value."""
+        day, slot, room_id = value
+        room_class = self.room_class.get(room_id)
+        if room_class is not None:
+            failed_rooms.setdefault((day, slot, room_class), room_id)
+    
+    def symmetric_value(self, failed_rooms: Dict[tuple, str], var_id: str, value: Any) -> bool:
+        """
+        True if value's room is a twin of a room that already failed for var_id at the
+        same (day, slot), and both rooms are currently held in exactly the same slots.
+        The subtrees are then mirror images, so this one would fail too.
+        """
+        day, slot, room_id = value
+        room_class = self.room_class.get(room_id)
+        tried = failed_rooms.get((day, slot, room_class))
+        if tried is None or tried == room_id:
+            return False
+        rooms = self.occupancy.rooms
+        for other_day, other_slot in self.day_slots:
+            if (rooms.get((tried, other_day, other_slot), 0) > 0) != (rooms.get((room_id, other_day, other_slot), 0) > 0):
+                return False
+        if self.backjumping:
+            # The skip relies on whoever holds the two rooms elsewhere
+            for other_day, other_slot in self.day_slots:
+                for holder in (self.room_holders.get((other_day, other_slot, tried)),
+                               self.room_holders.get((other_day, other_slot, room_id))):
+                    if holder is not None:
+                        self.conflict_sets[var_id].add(holder)
+        self.symmetry_skips += 1
+        return True
+    
+    def backjump(self, assignment: Assignment, stack: list, var_id: str) -> bool:
+        """
+        Unwinds the stack to the latest section that caused var_id's dead end and hands
+        it the remaining culprits. The culprits' placements are stored as a nogood.
+        Returns False if nobody is to blame (no placement can help: infeasible).
+        """
+        culprits = self.conflict_sets.pop(var_id) | self.explain_pruned(var_id)
+        culprits.discard(var_id)
+        if not culprits:
+            return False
+        
+        self.nogoods.add({c: assignment[c] for c in culprits})
+        target = max(culprits, key=self.depth.__getitem__)
+        
+        jumped = 0
+        while stack[-1][0] != target:
+            frame = stack.pop()
+            if frame[4] is not None:
+                self.unassign(assignment, frame[0], frame[3])
+            self.conflict_sets.pop(frame[0], None)
+            jumped += 1
+        if jumped:
+            self.backjump_count += 1
+            if self.log_sink.is_enabled(logging.DEBUG):
+                self.log(f"BACKJUMP: {self.vars_by_id[var_id].section_title} blocked by {self.vars_by_id[target].section_title}, skipping {jumped} levels.", level=logging.DEBUG)
+        
+        culprits.discard(target)
+        self.conflict_sets[target].update(culprits)
+        return True
+    
+    def restart_search(self, assignment: Assignment) -> Assignment | None:
+        """Runs the iterative engine under the restart schedule until it succeeds or proves failure."""
+        run = 0
+        while True:
+            run += 1
+            if self.restart_schedule == "luby":
+                self.failure_limit = self.restart_base * luby(run)
+            else:
+                self.failure_limit = int(self.restart_base * 1.5 ** (run - 1))
+            self.run_failures = 0
+            if self.seed is not None:
+                # Reproducible but different tie-breaking on every run
+                self.rng.seed(f"{self.seed}:{run}")
+            self.reset_value_order()
+            try:
+                return self.iterative_backtrack(assignment)
+            except RestartSearch:
+                self.restart_count += 1
+                self.log(f"RESTART #{self.restart_count}: {self.run_failures} failures in run {run}. Keeping {len(self.nogoods)} nogoods.")
+    
+    def solve(self, allow_partial: bool = False) -> Assignment | None:
+        """
+        Returns a complete assignment, or None if there is none or the budget ran out.
+        With allow_partial, both cases instead return the deepest partial assignment
+        seen, greedily extended, and self.unplaced says why each missing section was blocked.
+        Sections with no values left before search (after AC-3, if on) are then set aside
+        rather than failing the search outright.
+        """
         self.start_time = time.time()
+        self.budget.start()
+        self.budget_result = None
+        self.best_partial, self.best_depth, self.best_pending = {}, 0, False
+        self.unplaced = {}
+        self.set_aside = []
+        self.search_mark = None
         self.log("Starting CSP solver...")
         assignment: Assignment = {}
         try:
-            result = self.backtrack(assignment)
+            if self.arc_consistency and not self.propagate_arc_consistency(set_aside=allow_partial):
+                self.run_diagnosis()
+                return None
+            if allow_partial:
+                for var in self.variables:
+                    if self.live_domains.size(var.id) == 0:
+                        self.set_aside_section(var.id)
+            self.search_mark = self.live_domains.mark()
+            self.budget.enter("search")
+            if self.restarts:
+                result = self.restart_search(assignment)
+            elif self.iterative:
+                result = self.iterative_backtrack(assignment)
+            else:
+                result = self.backtrack(assignment)
+            if result is not None and self.set_aside:
+                self.log(f"CSP solver placed every section except the {len(self.set_aside)} set aside.", is_error=True)
+                return self.partial_result(result)
             if result is not None:
                 self.log("CSP solver found a solution.")
+                result = self.improve(result)
             else:
                 self.log("CSP solver could not find a solution.", is_error=True)
+                if allow_partial:
+                    return self.partial_result(assignment)
                 self.run_diagnosis()
             return result
-        except TimeoutError as e:
+        except BudgetExhausted as e:
+            self.budget_result = e.result
             self.log(str(e), is_error=True)
+            if allow_partial:
+                return self.partial_result(assignment)
             self.run_diagnosis()
             return None
+        finally:
+            self.log_sink.close()
+
+    def partial_result(self, assignment: Assignment) -> Assignment:
+        """
+        The deepest partial assignment seen, extended greedily by place_remaining(),
+        which also fills self.unplaced. `assignment` is the search's current one.
+        """
+        partial = dict(assignment) if self.best_pending else dict(self.best_partial)
+        depth = len(partial)
+        self.unplaced = self.place_remaining(partial)
+        self.log(f"Returning best partial assignment: {len(partial)}/{len(self.variables)} sections placed "
+                 f"({depth} by search, {len(partial) - depth} greedily).", is_error=True)
+        return partial
+
+    def place_remaining(self, assignment: Assignment) -> Dict[str, str]:
+        """
+        Greedily extends a partial assignment in place: each missing section, fewest
+        values first, takes its first value (in search order) that clashes with nothing
+        placed. Returns why each section still missing was blocked, counting the cause
+        of every domain value, e.g. "lecturer busy: 12, room taken: 30 (of 42 values)".
+        """
+        labels = {"lecturer": "lecturer busy", "room": "room taken", "cohort": "cohort clash",
+                  "exam_level": "level clash", "blocked": "blocked period",
+                  "custom": "custom conflict"}
+        occupancy = OccupancyIndex(self.vars_by_id)
+        for var_id, value in assignment.items():
+            occupancy.assign(var_id, value)
+
+        def blocker(var_id: str, value: Any) -> Optional[str]:
+            for scope in self.indexed_scopes:
+                if occupancy.conflicts(var_id, value, scope):
+                    return scope
+            if self.generic_constraints:
+                assignment[var_id] = value
+                failed = next((c for c in self.generic_constraints if not c(assignment, var_id, value)), None)
+                del assignment[var_id]
+                if failed is not None:
+                    return getattr(failed, "scope", None) or getattr(failed, "__name__", "constraint")
+            return None
+
+        reasons: Dict[str, str] = {}
+        missing = [var.id for var in self.variables if var.id not in assignment]
+        missing.sort(key=lambda var_id: len(self.domains[var_id]))
+        for var_id in missing:
+            blocked: Dict[str, int] = {}
+            for value in self.order_domain_values(var_id):
+                cause = blocker(var_id, value)
+                if cause is None:
+                    assignment[var_id] = value
+                    occupancy.assign(var_id, value)
+                    break
+                label = labels.get(cause, cause)
+                blocked[label] = blocked.get(label, 0) + 1
+            else:
+                if not blocked:
+                    reasons[var_id] = "empty domain"
+                    continue
+                counts = sorted(blocked.items(), key=lambda kv: -kv[1])
+                summary = ", ".join(f"{label}: {count}" for label, count in counts)
+                reasons[var_id] = f"{summary} (of {len(self.domains[var_id])} values)"
+        return reasons
+
+    def improve(self, assignment: Assignment, time_budget: Optional[float] = None) -> Assignment:
+        """Anneals a feasible assignment towards preferred values. Returns the best one seen."""
+        budget = self.improve_seconds if time_budget is None else time_budget
+        if not budget:
+            return assignment
+        self.budget.enter("improvement")
+        remaining = self.budget.remaining()
+        if remaining is not None:
+            budget = min(budget, remaining)
+        try:
+            return ScheduleAnnealer(self, seed=self.seed).improve(assignment, budget)
+        finally:
+            self.log_sink.close()
 
     def run_diagnosis(self):
         """
         Runs a diagnostic pass to explain WHY the schedule failed.
+        Bounded by the "diagnosis" phase budget, if one is set.
         """
+        try:
+            self.budget.enter("diagnosis")
+            self.diagnose()
+        except BudgetExhausted as e:
+            print(f"\n[Analysis] Diagnosis stopped early: {e}")
+            self.log(f"Diagnosis stopped early: {e}", is_error=True)
+
+    def diagnose(self):
         from diagnostics import generate_conflict_heatmap
         
         print("\n" + "="*60)
@@ -166,8 +851,12 @@ class CSP:
         print("="*60)
         self.log("Running failure diagnosis...")
         
+        # Back to the domains search started from (after AC-3): pruning left by an
+        # interrupted search reflects its last branch, not the problem
+        if self.search_mark is not None:
+            self.live_domains.undo(self.search_mark)
         day_names = ["Mon", "Tue", "Wed", "Thu", "Fri"]
-        generate_conflict_heatmap(self.variables, self.domains, day_names)
+        generate_conflict_heatmap(self.variables, self.live_domains, day_names)
 
         # 1. Check Global Capacity
         total_slots = sum(len(lect.available_time_slots) for lect in self.lecturers.values())
@@ -190,6 +879,7 @@ class CSP:
             
             # Try to find a valid assignment
             for value in self.domains[var_id]:
+                self.budget.check()
                 # Custom consistent check that records failures
                 temp_assignment = assignment.copy()
                 temp_assignment[var_id] = value
@@ -0,0 +1,191 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List, Any, Optional, Callable
+
+from occupancy import INDEXED_SCOPES, UNARY_SCOPES, _semester
+from portfolio import make_problem_constraints
+from csp import CSP, Assignment
+
+# Components smaller than this are batched together into one solver task
+MIN_TASK_SIZE = 25
+
+
+class _DisjointSet:
+    def __init__(self, items):
+        self.parent = {item: item for item in items}
+
+    def find(self, item):
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union_all(self, items: list):
+        if len(items) < 2:
+            return
+        root = self.find(items[0])
+        for item in items[1:]:
+            other = self.find(item)
+            if other != root:
+                self.parent[other] = root
+
+
+def interaction_components(sections: list, domains: Dict[str, list], constraints: list) -> List[List[str]]:
+    """
+    Splits the sections into groups that cannot constrain each other.
+    Two sections interact if they share a lecturer, a cohort in an overlapping
+    semester, an exam level (exam mode) or any candidate room. An untagged
+    constraint could link anything, so its presence keeps everything in one group.
+    Components come back largest first, each in the input section order.
+    """
+    var_ids = [sec.id for sec in sections]
+    scopes = {getattr(c, "scope", None) for c in constraints}
+    if scopes - set(INDEXED_SCOPES) - set(UNARY_SCOPES):
+        return [var_ids] if var_ids else []
+
+    groups: Dict[tuple, list] = {}
+    for sec in sections:
+        if "lecturer" in scopes:
+            groups.setdefault(("lecturer", sec.lecturer_id), []).append(sec.id)
+        if "cohort" in scopes:
+            for cohort in sec.cohorts:
+                groups.setdefault(("cohort", cohort, _semester(sec)), []).append(sec.id)
+        if "exam_level" in scopes:
+            groups.setdefault(("exam_level", str(sec.course_level), str(sec.semester)), []).append(sec.id)
+        if "room" in scopes:
+            for room_id in {value[2] for value in domains.get(sec.id, [])}:
+                groups.setdefault(("room", room_id), []).append(sec.id)
+
+    # A section with no semester clashes with the cohort in every semester
+    cohort_sems: Dict[Any, list] = {}
+    for key in groups:
+        if key[0] == "cohort":
+            cohort_sems.setdefault(key[1], []).append(key[2])
+
+    components = _DisjointSet(var_ids)
+    for key, members in groups.items():
+        components.union_all(members)
+    for cohort, sems in cohort_sems.items():
+        if None in sems and len(sems) > 1:
+            components.union_all([groups[("cohort", cohort, sem)][0] for sem in sems])
+
+    by_root: Dict[str, List[str]] = {}
+    for var_id in var_ids:
+        by_root.setdefault(components.find(var_id), []).append(var_id)
+    return sorted(by_root.values(), key=len, reverse=True)
+
+
+def _solve_component(problem: Dict[str, Any], settings: Dict[str, Any], timeout_seconds: float) -> Optional[Assignment]:
+    """Solves one sub-problem. Top-level so a process pool can pickle it."""
+    if settings.get("quiet"):
+        sys.stdout = open(os.devnull, "w")
+    solver = CSP(problem["sections"], problem["domains"], make_problem_constraints(problem), problem["lecturers"],
+                 preferences=problem["preferences"], log_file=os.devnull,
+                 timeout_seconds=timeout_seconds, forward_checking=True, arc_consistency=True,
+                 backjumping=True, restarts=settings.get("restarts", True), seed=settings.get("seed"),
+                 room_classes=problem.get("room_classes"))
+    return solver.solve()
+
+
+def solve_components(problem: Dict[str, Any], constraints: list, workers: int = 1,
+                     timeout_seconds: int = 30, seed: Optional[int] = None,
+                     restarts: bool = True,
+                     progress_callback: Optional[Callable[[str], None]] = None,
+                     log: Callable[[str], None] = print) -> Optional[Assignment]:
+    """
+    Solves each interaction component as its own CSP and merges the partial
+    assignments. With workers > 1 the components run in a process pool.
+    Returns None as soon as any component has no solution. timeout_seconds covers
+    the whole call: each component gets whatever is left when it starts.
+
+    problem is the picklable dict described in portfolio.solve_portfolio;
+    constraints are the parent's constraint closures (only their scopes are read).
+    """
+    deadline = time.monotonic() + timeout_seconds
+    sections = problem["sections"]
+    by_id = {sec.id: sec for sec in sections}
+    components = interaction_components(sections, problem["domains"], constraints)
+    log(f"[Decompose] {len(sections)} sections split into {len(components)} independent components "
+        f"(largest {len(components[0]) if components else 0}).")
+
+    # Large components get their own task; small ones share tasks of about MIN_TASK_SIZE sections
+    tasks: List[List[str]] = []
+    batch: List[str] = []
+    for component in components:
+        if len(component) >= MIN_TASK_SIZE:
+            tasks.append(component)
+            continue
+        batch.extend(component)
+        if len(batch) >= MIN_TASK_SIZE:
+            tasks.append(batch)
+            batch = []
+    if batch:
+        tasks.append(batch)
+
+    def sub_problem(var_ids: List[str]) -> Dict[str, Any]:
+        sub = dict(problem)
+        sub["sections"] = [by_id[var_id] for var_id in var_ids]
+        sub["domains"] = {var_id: problem["domains"][var_id] for var_id in var_ids}
+        return sub
+
+    settings = {"restarts": restarts, "seed": seed, "quiet": workers > 1}
+    solution: Assignment = {}
+
+    def merge(part: Optional[Assignment]) -> bool:
+        if part is None:
+            return False
+        solution.update(part)
+        if progress_callback:
+            pct = (len(solution) / len(sections)) * 100
+            progress_callback(f"PROGRESS:{len(solution)}/{len(sections)}|{pct:.1f}")
+        return True
+
+    def remaining() -> float:
+        return max(0.0, deadline - time.monotonic())
+
+    def give_up(var_ids: List[str]) -> None:
+        """Logs why the component var_ids failed (no solution, or the deadline passed)."""
+        if remaining():
+            log(f"[Decompose] A component of {len(var_ids)} sections has no solution.")
+        else:
+            log(f"[Decompose] Out of time with {len(solution)} of {len(sections)} sections placed.")
+        return None
+
+    if workers <= 1 or len(tasks) == 1:
+        for var_ids in tasks:
+            if not remaining() or not merge(_solve_component(sub_problem(var_ids), settings, remaining())):
+                return give_up(var_ids)
+        return solution
+
+    # Tasks are submitted as workers free up, so each starts with the time actually left
+    executor = ProcessPoolExecutor(max_workers=min(workers, len(tasks)))
+    unsubmitted = iter(tasks)
+    futures = {}
+
+    def submit_next():
+        var_ids = next(unsubmitted, None)
+        if var_ids is not None:
+            futures[executor.submit(_solve_component, sub_problem(var_ids), settings, remaining())] = var_ids
+
+    try:
+        for _ in range(min(workers, len(tasks))):
+            submit_next()
+        while futures:
+            done, _ = wait(futures, timeout=remaining(), return_when=FIRST_COMPLETED)
+            if not done:
+                return give_up(next(iter(futures.values())))
+            for future in done:
+                var_ids = futures.pop(future)
+                if not merge(future.result()):
+                    return give_up(var_ids)
+                if remaining():
+                    submit_next()
+        if len(solution) < len(sections):
+            return give_up(next(unsubmitted))
+    finally:
+        # Running components stop at the same deadline
+        executor.shutdown(wait=False, cancel_futures=True)
+    return solution
@@ -2,6 +2,7 @@
 import pandas as pd
 import os
 from load_data import normalize_name
+from domains import DomainGrid
 
 import shap
 def run_health_check(input_csv, availability_csv):
@@ -54,21 +55,26 @@ def generate_conflict_heatmap(variables, domains, day_names):
     """
     Analyzes domain sizes and identifies the 'bottleneck' slots that are 
     most contested by different course sections.
+    Accepts either the builder's domain dict or a DomainGrid.
     """
     print("\n" + "-"*60)
     print("PROACTIVE BOTTLENECK ANALYSIS (HEATMAP)")
     print("-"*60)
     
     # Count how many sections can potentially fit into each (day, slot)
-    slot_contention = {} # (day, slot) -> count
-    
-    for var_id in domains:
-        seen_in_var = set()
-        for day, slot, room_id in domains[var_id]:
-            pair = (day, slot)
-            if pair not in seen_in_var:
-                slot_contention[pair] = slot_contention.get(pair, 0) + 1
-                seen_in_var.add(pair)
+    if isinstance(domains, DomainGrid):
+        # Vectorized over the solver's live domains
+        slot_contention = domains.slot_demand()
+    else:
+        slot_contention = {} # (day, slot) -> count
+        
+        for var_id in domains:
+            seen_in_var = set()
+            for day, slot, room_id in domains[var_id]:
+                pair = (day, slot)
+                if pair not in seen_in_var:
+                    slot_contention[pair] = slot_contention.get(pair, 0) + 1
+                    seen_in_var.add(pair)
                 
     # Sort slots by contention level
     sorted_slots = sorted(slot_contention.items(), key=lambda x: x[1], reverse=True)
@@ -0,0 +1,338 @@
+import heapq
+from collections.abc import Sequence
+from typing import Dict, List, Tuple, Optional, Callable, FrozenSet, Iterable
+import numpy as np
+
+Value = Tuple[int, int, str]  # (day, slot, room_id)
+
+
+class FactoredDomain(Sequence):
+    """
+    A section's candidate values as a time mask times a room list: every (day, slot)
+    in `slots` with every room in `rooms`, in that nesting order (build_domain's),
+    minus the values in `excluded`.
+    Behaves like the list it stands for, without building it: iteration generates
+    values, len() and `in` are arithmetic, and indexing is too unless values are
+    excluded, in which case the list is materialized once and kept. builder.intern
+    shares one instance between all sections with the same factors, so that cost
+    is paid per distinct domain rather than per section.
+    """
+    __slots__ = ("slots", "rooms", "excluded", "_length", "_slot_pos", "_room_pos", "_values")
+
+    def __init__(self, slots: Iterable[Tuple[int, int]], rooms: Iterable[str],
+                 excluded: FrozenSet[Value] = frozenset()):
+        self.slots = tuple(slots)
+        self.rooms = tuple(rooms)
+        self._slot_pos = {day_slot: i for i, day_slot in enumerate(self.slots)}
+        self._room_pos = {room_id: i for i, room_id in enumerate(self.rooms)}
+        # Only exclusions inside the product count
+        self.excluded = frozenset(value for value in excluded
+                                  if value[:2] in self._slot_pos and value[2] in self._room_pos)
+        self._length = len(self.slots) * len(self.rooms) - len(self.excluded)
+        self._values: Optional[List[Value]] = None
+
+    def key(self) -> tuple:
+        return (self.slots, self.rooms, self.excluded)
+
+    def __reduce__(self):
+        # Pickles as its factors; the materialized list is rebuilt on demand
+        return (FactoredDomain, self.key())
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self):
+        excluded = self.excluded
+        for day, slot in self.slots:
+            for room_id in self.rooms:
+                if not excluded or (day, slot, room_id) not in excluded:
+                    yield (day, slot, room_id)
+
+    def __contains__(self, value) -> bool:
+        try:
+            day, slot, room_id = value
+        except (TypeError, ValueError):
+            return False
+        return ((day, slot) in self._slot_pos and room_id in self._room_pos
+                and (day, slot, room_id) not in self.excluded)
+
+    def has_slot(self, day: int, slot: int) -> bool:
+        return (day, slot) in self._slot_pos
+
+    def __getitem__(self, i):
+        if self.excluded or isinstance(i, slice):
+            return self.values()[i]
+        if i < 0:
+            i += self._length
+        if not 0 <= i < self._length:
+            raise IndexError("domain index out of range")
+        day, slot = self.slots[i // len(self.rooms)]
+        return (day, slot, self.rooms[i % len(self.rooms)])
+
+    def index(self, value, start: int = 0, stop: Optional[int] = None) -> int:
+        if self.excluded or start or stop is not None:
+            return self.values().index(value, start, *(() if stop is None else (stop,)))
+        if value not in self:
+            raise ValueError(f"{value!r} is not in domain")
+        return self.product_index(value)
+
+    def product_index(self, value: Value) -> int:
+        """Position of value in the full slots x rooms product, ignoring exclusions."""
+        return self._slot_pos[value[:2]] * len(self.rooms) + self._room_pos[value[2]]
+
+    def values(self) -> List[Value]:
+        """The materialized value list (built once, shared by every holder; do not modify)."""
+        if self._values is None:
+            self._values = list(iter(self))
+        return self._values
+
+    def rooms_by_slot(self) -> Dict[Tuple[int, int], List[str]]:
+        """(day, slot) -> its rooms, without the excluded values; slots left with no room are dropped."""
+        rooms = list(self.rooms)
+        gone: Dict[Tuple[int, int], set] = {}
+        for day, slot, room_id in self.excluded:
+            gone.setdefault((day, slot), set()).add(room_id)
+        by_slot = {}
+        for day_slot in self.slots:
+            if day_slot not in gone:
+                by_slot[day_slot] = rooms
+                continue
+            left = [room_id for room_id in rooms if room_id not in gone[day_slot]]
+            if left:
+                by_slot[day_slot] = left
+        return by_slot
+
+    def restrict(self, slots: Iterable[Tuple[int, int]] = (), values: Iterable[Value] = ()) -> "FactoredDomain":
+        """A copy without the given (day, slot)s and values."""
+        slots, values = set(slots), set(values)
+        if not slots and not values:
+            return self
+        return FactoredDomain([day_slot for day_slot in self.slots if day_slot not in slots],
+                              self.rooms, self.excluded.union(values))
+
+    def __eq__(self, other):
+        # Equal to any domain or list with the same values in the same order, like a list
+        if isinstance(other, FactoredDomain) and self.key() == other.key():
+            return True
+        if isinstance(other, (FactoredDomain, list, tuple)):
+            return len(self) == len(other) and list(self) == list(other)
+        return NotImplemented
+
+    # Unhashable, like the list it stands for: equal domains can have different
+    # factors, so no hash of the factors would agree with __eq__. Share instances
+    # through builder.intern (keyed by the factors) or by id().
+    __hash__ = None
+
+    def __repr__(self):
+        return f"FactoredDomain({len(self.slots)} slots x {len(self.rooms)} rooms - {len(self.excluded)})"
+
+
+class DomainGrid:
+    """
+    Compact domain engine for the timetable solver.
+    Rooms are interned to integers and each section's domain is a boolean mask
+    over the day x slot x room grid, so pruning, counting and intersection run
+    as NumPy operations over many sections at once.
+    Every removal is recorded on a trail so a backtrack can restore the domains
+    to an earlier mark in reverse order.
+    """
+
+    def __init__(self, domains: Dict[str, List[Value]]):
+        self.var_ids = list(domains)
+        self.var_index = {var_id: i for i, var_id in enumerate(self.var_ids)}
+        # Factored domains are read through their factors, and a shared one fills its mask once
+        factored = {id(values): values for values in domains.values() if isinstance(values, FactoredDomain)}
+        plain = [values for values in domains.values() if not isinstance(values, FactoredDomain)]
+        room_ids, days, slots = set(), {0}, {0}
+        for values in factored.values():
+            room_ids.update(values.rooms)
+            days.update(day for day, _ in values.slots)
+            slots.update(slot for _, slot in values.slots)
+        for values in plain:
+            for day, slot, room_id in values:
+                room_ids.add(room_id)
+                days.add(day)
+                slots.add(slot)
+        self.room_ids = sorted(room_ids)
+        self.room_index = {room_id: i for i, room_id in enumerate(self.room_ids)}
+        self.shape = (max(days) + 1, max(slots) + 1, len(self.room_ids))
+
+        self.mask = np.zeros((len(self.var_ids),) + self.shape, dtype=bool)
+        rows: Dict[int, np.ndarray] = {}
+        for i, var_id in enumerate(self.var_ids):
+            values = domains[var_id]
+            if not values:
+                continue
+            if isinstance(values, FactoredDomain):
+                row = rows.get(id(values))
+                if row is None:
+                    row = rows[id(values)] = self._factored_row(values)
+                self.mask[i] = row
+                continue
+            days, slots, rooms = zip(*values)
+            self.mask[i, list(days), list(slots), [self.room_index[r] for r in rooms]] = True
+
+        self.sizes = self.mask.sum(axis=(1, 2, 3))
+        self.assigned = np.zeros(len(self.var_ids), dtype=bool)
+        # Trail entries: (var indices, day, slot, room index or None, removed rows/None, counts)
+        self.trail: List[tuple] = []
+        # Called with the var_id whenever its size changes (feeds the MRV queue)
+        self.on_change: Optional[Callable[[str], None]] = None
+
+    def _factored_row(self, values: FactoredDomain) -> np.ndarray:
+        times = np.zeros(self.shape[:2], dtype=bool)
+        days, slots = zip(*values.slots)
+        times[list(days), list(slots)] = True
+        rooms = np.zeros(self.shape[2], dtype=bool)
+        rooms[[self.room_index[r] for r in values.rooms]] = True
+        row = times[:, :, None] & rooms
+        if values.excluded:
+            days, slots, room_ids = zip(*values.excluded)
+            row[list(days), list(slots), [self.room_index[r] for r in room_ids]] = False
+        return row
+
+    # --- Lookups ---
+
+    def size(self, var_id: str) -> int:
+        return int(self.sizes[self.var_index[var_id]])
+
+    def contains(self, var_id: str, value: Value) -> bool:
+        day, slot, room_id = value
+        return bool(self.mask[self.var_index[var_id], day, slot, self.room_index[room_id]])
+
+    def indices(self, var_ids) -> np.ndarray:
+        return np.fromiter((self.var_index[v] for v in var_ids), dtype=np.intp)
+
+    def unassigned(self, indices: np.ndarray) -> np.ndarray:
+        return indices[~self.assigned[indices]]
+
+    def set_assigned(self, var_id: str, assigned: bool):
+        self.assigned[self.var_index[var_id]] = assigned
+
+    def live_slots(self, var_id: str) -> List[Tuple[int, int]]:
+        """(day, slot) pairs where var_id still has at least one room."""
+        days, slots = np.nonzero(self.mask[self.var_index[var_id]].any(axis=2))
+        return list(zip(days.tolist(), slots.tolist()))
+
+    def live_rooms(self, var_id: str, day: int, slot: int) -> List[str]:
+        return [self.room_ids[r] for r in np.flatnonzero(self.mask[self.var_index[var_id], day, slot]).tolist()]
+
+    def live_values(self, var_id: str) -> List[Value]:
+        days, slots, rooms = np.nonzero(self.mask[self.var_index[var_id]])
+        return [(d, s, self.room_ids[r]) for d, s, r in zip(days.tolist(), slots.tolist(), rooms.tolist())]
+
+    def slot_demand(self) -> Dict[Tuple[int, int], int]:
+        """Number of sections that can still use each (day, slot)."""
+        demand = self.mask.any(axis=3).sum(axis=0)
+        return {(d, s): int(demand[d, s]) for d, s in zip(*np.nonzero(demand))}
+
+    # --- Pruning ---
+
+    def mark(self) -> int:
+        return len(self.trail)
+
+    def remove_slot(self, indices: np.ndarray, day: int, slot: int) -> np.ndarray:
+        """
+        Removes every room at (day, slot) from the given sections' domains.
+        Returns the indices whose domains actually shrank.
+        """
+        rows = self.mask[indices, day, slot]
+        counts = rows.sum(axis=1)
+        hit = counts > 0
+        if not hit.any():
+            return indices[:0]
+        changed = indices[hit]
+        self.trail.append((changed, day, slot, None, rows[hit], counts[hit]))
+        self.mask[changed, day, slot] = False
+        self.sizes[changed] -= counts[hit]
+        self._notify(changed)
+        return changed
+
+    def remove_value(self, indices: np.ndarray, value: Value) -> np.ndarray:
+        """Removes (day, slot, room) from the given sections' domains. Returns the indices that had it."""
+        day, slot, room_id = value
+        r = self.room_index.get(room_id)
+        if r is None:
+            return indices[:0]
+        changed = indices[self.mask[indices, day, slot, r]]
+        if not len(changed):
+            return changed
+        self.trail.append((changed, day, slot, r, None, 1))
+        self.mask[changed, day, slot, r] = False
+        self.sizes[changed] -= 1
+        self._notify(changed)
+        return changed
+
+    def restrict(self, var_id: str, allowed: np.ndarray) -> int:
+        """Intersects var_id's domain with a day x slot x room mask. Returns the number removed."""
+        i = self.var_index[var_id]
+        removed = self.mask[i] & ~allowed
+        count = int(removed.sum())
+        if count:
+            self.trail.append((i, None, None, None, removed, count))
+            self.mask[i] &= allowed
+            self.sizes[i] -= count
+            self._notify(np.array([i]))
+        return count
+
+    def undo(self, mark: int):
+        """Restores every removal recorded after mark."""
+        while len(self.trail) > mark:
+            indices, day, slot, r, rows, counts = self.trail.pop()
+            if day is None:
+                self.mask[indices] |= rows
+            elif r is None:
+                self.mask[indices, day, slot] = rows
+            else:
+                self.mask[indices, day, slot, r] = True
+            self.sizes[indices] += counts
+            self._notify(np.atleast_1d(indices))
+
+    def _notify(self, indices: np.ndarray):
+        if self.on_change:
+            for i in indices.tolist():
+                self.on_change(self.var_ids[i])
+
+
+class MRVQueue:
+    """
+    Most-constrained-first selection over live domain sizes.
+    A heap keyed on (size, position in the variable list) with lazy deletion:
+    every size change pushes a fresh entry and stale ones are dropped on peek.
+    Ties go to the earlier variable, matching the old linear scan.
+    """
+
+    def __init__(self, order: List[str], size: Callable[[str], int]):
+        self.position = {var_id: i for i, var_id in enumerate(order)}
+        self.size = size  # Reads the live domain size, always current
+        self.active = set(order)
+        self.heap = [(size(var_id), i, var_id) for i, var_id in enumerate(order)]
+        heapq.heapify(self.heap)
+
+    def push(self, var_id: str):
+        if var_id in self.active:
+            heapq.heappush(self.heap, (self.size(var_id), self.position[var_id], var_id))
+            if len(self.heap) > 8 * len(self.active) + 1024:
+                self._compact()
+
+    def discard(self, var_id: str):
+        """Takes an assigned variable out of selection."""
+        self.active.discard(var_id)
+
+    def add(self, var_id: str):
+        """Puts an unassigned variable back into selection."""
+        self.active.add(var_id)
+        self.push(var_id)
+
+    def peek(self) -> Optional[str]:
+        heap = self.heap
+        while heap:
+            size, _, var_id = heap[0]
+            if var_id in self.active and self.size(var_id) == size:
+                return var_id
+            heapq.heappop(heap)
+        return None
+
+    def _compact(self):
+        self.heap = [(self.size(v), self.position[v], v) for v in self.active]
+        heapq.heapify(self.heap)
@@ -1,4 +1,5 @@
 import csv
+import os
 
 SLOT_TIME = {
     0: ("7:00 AM", "9:30 AM"),
@@ -16,9 +17,12 @@ EXAM_SLOT_TIME = {
     1: ("2:00 PM", "4:30 PM")
 }
 
-def export_solution(solution, data, out_path : str, blocked_blocks: list = None, exam_mode: bool = False):
+def export_solution(solution, data, out_path : str, blocked_blocks: list = None, exam_mode: bool = False,
+                    unplaced: dict = None):
     """
     Exports the scheduling solution to a CSV file.
+    If the solution is partial, pass unplaced ({section id: reason}, see CSP.unplaced) to
+    also write the sections still to be placed by hand (see export_unplaced).
     """
     days = data["config"]["days"]
     sections_by_id = {sec.id: sec for sec in data["sections"]}
@@ -90,4 +94,42 @@ def export_solution(solution, data, out_path : str, blocked_blocks: list = None,
     with open(out_path, "w", newline='', encoding='utf-8') as f:
         writer = csv.writer(f)
         writer.writerows(rows)
-    print(f"Schedule exported to {out_path}")
\ No newline at end of file
+    print(f"Schedule exported to {out_path}")
+
+    if unplaced:
+        export_unplaced(unplaced, data, unplaced_path(out_path))
+
+
+def unplaced_path(out_path: str) -> str:
+    """Where export_solution writes the unplaced sections: schedule.csv -> schedule_unplaced.csv"""
+    root, ext = os.path.splitext(out_path)
+    return f"{root}_unplaced{ext or '.csv'}"
+
+
+def export_unplaced(unplaced, data, out_path: str):
+    """
+    Writes the sections a partial solution could not place, with why each was blocked,
+    so they can be placed by hand.
+    """
+    sections_by_id = {sec.id: sec for sec in data["sections"]}
+    courses = data["courses"]
+    lecturers = data["lecturers"]
+
+    rows = [["Course Code", "Course Title", "Credit Hrs", "Lecturer Name", "Enrollment", "Reason"]]
+    for sec_id, reason in unplaced.items():
+        sec = sections_by_id[sec_id]
+        course = courses[sec.course_code]
+        lecturer = lecturers.get(sec.lecturer_id)
+        rows.append([
+            course.code,
+            sec.section_title,
+            course.credit_hours,
+            lecturer.name if lecturer else sec.lecturer_id,
+            sec.enrollment,
+            reason
+        ])
+
+    with open(out_path, "w", newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerows(rows)
+    print(f"{len(unplaced)} unplaced sections exported to {out_path}")
\ No newline at end of file
@@ -1,6 +1,7 @@
 
 import pandas as pd
 import os
+import zlib
 from typing import  Dict, List
 from data_model import Lecturer, Room, Course, ClassSection
 
@@ -42,8 +43,9 @@ def guess_semester(course_code: str, title: str) -> str:
     # Let's use a more robust hash-based alternation if we can't tell, to balance load.
     # But first, specific VVU patterns if known.
     
-    # Default: Alternating based on code to spread load if we have no clue
-    return "1" if hash(code) % 2 == 0 else "2"
+    # Default: Alternating based on code to spread load if we have no clue.
+    # crc32 rather than hash(): str hashes are salted per process, and the guess must not change between runs.
+    return "1" if zlib.crc32(code.encode("utf-8")) % 2 == 0 else "2"
 
 def load_level_data() -> Dict[str, int]:
 
@@ -259,7 +261,18 @@ def load_combined_data(paths: List[str],
     config = {
         "days": ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"],
         "slots_per_day": 4, 
-        "strict_capacity": False
+        "strict_capacity": False,
+        # Solver options (run_headless)
+        "solver_restarts": True,
+        "solver_seed": None,  # Set an integer for reproducible runs
+        "solver_workers": 1,  # >1 races that many differently seeded solvers (portfolio.py)
+        "solver_engine": "backtracking",  # "local_search" (local_search.py) or "two_phase" (two_phase.py)
+        "solver_improve_seconds": 0,  # Annealing budget for soft preferences after a feasible timetable (0 = off)
+        "solver_decompose": False,  # Solve independent groups of sections separately (decompose.py)
+        "solver_phase_budgets": {"diagnosis": 10},  # Extra per-phase limits in seconds (budget.PHASES)
+        "solver_log_level": "INFO",  # "DEBUG" adds a line per rejected section and backjump to csp_log.txt
+        "solver_allow_partial": True,  # Export the best partial timetable (+ *_unplaced.csv) if no full one is found
+        "solver_repair_from": None  # Path of a previous export to repair instead of solving from scratch (repair.py)
     }
 
 
@@ -0,0 +1,225 @@
+from typing import List, Dict, Any, Callable, Optional, Union
+from data_model import ClassSection, Lecturer
+from occupancy import OccupancyIndex, INDEXED_SCOPES, UNARY_SCOPES
+from conflict_graph import ConflictGraph
+from csp import Assignment, Domain, Constraint
+from budget import SolverBudget, BudgetExhausted, BudgetResult
+from solver_log import SolverLog
+import logging
+import random
+from datetime import datetime
+import time
+
+_MISSING = object()
+
+
+class MinConflictsSolver:
+    """
+    Local search alternative to csp.CSP for large instances.
+    Starts from a complete greedy assignment that may contain clashes, then keeps
+    moving a conflicted section to the value in its domain with the fewest
+    violations. Recently left values are tabu for a few steps, and a small share
+    of moves is a random walk, so the search escapes plateaus and local minima.
+    solve() returns the same {section id: (day, slot, room_id)} mapping as CSP.solve().
+    """
+
+    def __init__(self,
+                 variables: List[ClassSection],
+                 domains: Domain,
+                 constraints: List[Constraint],
+                 lecturers: Dict[str, Lecturer],
+                 preferences: Dict = None,
+                 progress_callback: Optional[Callable[[str], None]] = None,
+                 log_file: str = "csp_log.txt",
+                 timeout_seconds: int = 30,
+                 max_steps: Optional[int] = None,
+                 tabu_tenure: int = 10,
+                 walk_probability: float = 0.02,
+                 seed: Optional[int] = None,
+                 log_level: Union[int, str] = logging.INFO):
+        self.variables = variables
+        self.domains = domains
+        self.constraints = constraints
+        self.lecturers = lecturers
+        self.preferences = preferences or {}
+        self.progress_callback = progress_callback
+        self.log_file = log_file
+        self.timeout_seconds = timeout_seconds
+        self.max_steps = max_steps
+        self.tabu_tenure = tabu_tenure
+        self.walk_probability = walk_probability
+        self.rng = random.Random(seed)
+        self.start_time = None
+        # Each step counts as a node, so max_steps is the node budget
+        self.budget = SolverBudget(timeout_seconds, max_nodes=max_steps)
+        self.budget_result: Optional[BudgetResult] = None
+
+        self.vars_by_id = {var.id: var for var in variables}
+
+        # Same constraint semantics as CSP: tagged scopes are counted from the occupancy
+        # index, custom course pairs from a conflict graph (see conflict_graph.py) and
+        # the placed sections' bits per (day, slot), unary ones filter the candidate
+        # values up front, anything else is called against the full assignment.
+        self.occupancy = OccupancyIndex(self.vars_by_id)
+        self.indexed_scopes = [c.scope for c in constraints if getattr(c, "scope", None) in INDEXED_SCOPES]
+        unary = [c for c in constraints if getattr(c, "scope", None) in UNARY_SCOPES]
+        custom = [c for c in constraints if getattr(c, "scope", None) == "custom" and hasattr(c, "pairs")]
+        self.custom_graph = (ConflictGraph(self.vars_by_id, ["custom"], [pair for c in custom for pair in c.pairs])
+                             if custom else None)
+        self.generic_constraints = [c for c in constraints
+                                    if getattr(c, "scope", None) not in INDEXED_SCOPES + UNARY_SCOPES and c not in custom]
+        self.candidates: Dict[str, list] = {
+            var.id: [value for value in domains[var.id]
+                     if all(c({var.id: value}, var.id, value) for c in unary)]
+            for var in variables
+        }
+
+        self.slot_members: Dict[tuple, Dict[str, None]] = {}  # (day, slot) -> placed sections
+        self.slot_bits: Dict[tuple, int] = {}  # (day, slot) -> the same sections as a conflict graph bitset
+        self.conflicted: Dict[str, None] = {}  # Insertion-ordered so a fixed seed replays exactly
+        self.tabu: Dict[tuple, int] = {}  # (var_id, value) -> step until which it may not be retaken
+        self.step_count = 0
+        self.best_conflicts = None
+
+        self.log_sink = SolverLog(log_file, level=log_level, progress_callback=progress_callback,
+                                  header=f"----Local Search Session Started at {datetime.now()}----")
+
+    def log(self, message: str, is_error: bool = False, level: Optional[int] = None):
+        if level is None:
+            level = logging.ERROR if is_error else logging.INFO
+        self.log_sink.write(level, message)
+
+    def violations(self, assignment: Assignment, var_id: str, value: Any) -> int:
+        """Number of clashes var_id=value would have. var_id must be out of the occupancy index."""
+        count = 0
+        for scope in self.indexed_scopes:
+            count += self.occupancy.conflict_count(var_id, value, scope)
+        if self.custom_graph is not None:
+            count += (self.custom_graph.adjacency[var_id] & self.slot_bits.get(value[:2], 0)).bit_count()
+        if self.generic_constraints:
+            previous = assignment.get(var_id, _MISSING)
+            assignment[var_id] = value
+            count += sum(1 for c in self.generic_constraints if not c(assignment, var_id, value))
+            if previous is _MISSING:
+                del assignment[var_id]
+            else:
+                assignment[var_id] = previous
+        return count
+
+    def place(self, assignment: Assignment, var_id: str, value: Any):
+        assignment[var_id] = value
+        self.occupancy.assign(var_id, value)
+        self.slot_members.setdefault(value[:2], {})[var_id] = None
+        if self.custom_graph is not None:
+            self.slot_bits[value[:2]] = self.slot_bits.get(value[:2], 0) | self.custom_graph.bit[var_id]
+
+    def lift(self, assignment: Assignment, var_id: str) -> Any:
+        value = assignment[var_id]
+        self.occupancy.unassign(var_id, value)
+        del self.slot_members[value[:2]][var_id]
+        if self.custom_graph is not None:
+            self.slot_bits[value[:2]] &= ~self.custom_graph.bit[var_id]
+        return value
+
+    def refresh(self, assignment: Assignment, var_id: str):
+        """Re-evaluates whether a placed section is currently in conflict."""
+        value = self.lift(assignment, var_id)
+        conflicted = self.violations(assignment, var_id, value) > 0
+        self.place(assignment, var_id, value)
+        if conflicted:
+            self.conflicted[var_id] = None
+        else:
+            self.conflicted.pop(var_id, None)
+
+    def best_values(self, assignment: Assignment, var_id: str, current: Any = _MISSING) -> List[Any]:
+        """The non-tabu values with the fewest violations. A conflict-free value is never tabu."""
+        best_count = None
+        best = []
+        for value in self.candidates[var_id]:
+            if value == current:
+                continue
+            count = self.violations(assignment, var_id, value)
+            if count and self.tabu.get((var_id, value), 0) > self.step_count:
+                continue
+            if best_count is None or count < best_count:
+                best_count, best = count, [value]
+            elif count == best_count:
+                best.append(value)
+        return best
+
+    def initial_assignment(self) -> Assignment:
+        """Greedy start: smallest domains first, each at its least-conflicting value."""
+        assignment: Assignment = {}
+        order = sorted(self.vars_by_id, key=lambda var_id: len(self.candidates[var_id]))
+        for var_id in order:
+            self.place(assignment, var_id, self.rng.choice(self.best_values(assignment, var_id)))
+        for var_id in order:
+            self.refresh(assignment, var_id)
+        return assignment
+
+    def step(self, assignment: Assignment):
+        self.step_count += 1
+        var_id = self.rng.choice(list(self.conflicted))
+        current = self.lift(assignment, var_id)
+
+        candidates = self.candidates[var_id]
+        if len(candidates) > 1 and self.rng.random() < self.walk_probability:
+            value = self.rng.choice(candidates)
+        else:
+            best = self.best_values(assignment, var_id, current)
+            value = self.rng.choice(best) if best else current
+
+        self.tabu[(var_id, current)] = self.step_count + self.tabu_tenure
+        self.place(assignment, var_id, value)
+
+        # Only sections sharing the old or new (day, slot) can change state,
+        # unless untagged constraints may link any two sections.
+        if self.generic_constraints:
+            affected = list(assignment)
+        else:
+            affected = list(self.slot_members.get(current[:2], {})) + list(self.slot_members[value[:2]])
+        for other_id in affected:
+            self.refresh(assignment, other_id)
+
+    def report_progress(self):
+        if self.step_count % 50 == 0:
+            placed = len(self.variables) - len(self.conflicted)
+            pct = (placed / len(self.variables)) * 100
+            self.log(f"PROGRESS:{placed}/{len(self.variables)}|{pct:.1f}")
+
+    def solve(self) -> Assignment | None:
+        try:
+            return self.search()
+        finally:
+            self.log_sink.close()
+
+    def search(self) -> Assignment | None:
+        self.start_time = time.time()
+        self.budget.start()
+        self.budget_result = None
+        self.log("Starting min-conflicts local search...")
+
+        empty = [var_id for var_id, values in self.candidates.items() if not values]
+        if empty:
+            self.log(f"No usable values for {len(empty)} sections (e.g. {empty[0]}).", is_error=True)
+            return None
+
+        assignment = self.initial_assignment()
+        self.best_conflicts = len(self.conflicted)
+        self.log(f"Initial assignment has {self.best_conflicts} conflicted sections.")
+
+        self.budget.enter("search")
+        try:
+            while self.conflicted:
+                self.budget.node()
+                self.step(assignment)
+                self.best_conflicts = min(self.best_conflicts, len(self.conflicted))
+                self.report_progress()
+        except BudgetExhausted as e:
+            self.budget_result = e.result
+            self.log(f"{e} with {len(self.conflicted)} conflicted sections (best {self.best_conflicts}).",
+                     is_error=True)
+            return None
+
+        self.log(f"Local search found a solution after {self.step_count} steps.")
+        return assignment
@@ -125,7 +125,7 @@ def main():
         
     #3. Build Constraints and Domains Mapping
     print("Building constraints and domains...")
-    domain = build_domain(data)
+    domain = build_domain(data, blocked_blocks)
     constraints = make_constraints(data["sections"], data["rooms"], preference_model, blocked_blocks)
     
     #4 Solver execution
@@ -2,13 +2,15 @@
 # main_web.py - Headless AI Scheduler Core
 import sys
 import os
+import json
 import pandas as pd
 from load_data import load_combined_data
-from builder import build_domain, build_exam_domain
+from builder import build_domain, build_exam_domain, room_equivalence_classes
 from constraints import make_constraints, make_exam_constraints
 from csp import CSP
 from analyzer import train_model, load_trained_model
 from export_data import export_solution
+from solution_cache import SolutionCache, input_key
 
 def run_headless(input_file, mode_choice, output_file, ai_preference, course_type="Departmental", dept_choice="1", avail_mode="1", exam_mode=False):
     """
@@ -41,9 +43,10 @@ def run_headless(input_file, mode_choice, output_file, ai_preference, course_typ
         else:
             rooms_path = "rooms.csv"
     
+    default_gen_path = "vvu_general_schedule.csv"
+    
     # 2. General Schedule Dependency (Silently handled)
     blocked_blocks = []
-    default_gen_path = "vvu_general_schedule.csv"
     if os.path.exists(default_gen_path) and not exam_mode:
         from load_data import load_general_schedule_blocks
         blocked_blocks = load_general_schedule_blocks(default_gen_path)
@@ -73,20 +76,7 @@ def run_headless(input_file, mode_choice, output_file, ai_preference, course_typ
         data.sections.sort(key=exam_sort_key)
         print("[INFO] Prioritized General Courses for Scheduling.")
     
-    # 4. Solve
-    print("[AI] Solving CSP Constraints...")
-    
-    if exam_mode:
-        domain = build_exam_domain(raw_data)
-        constraints = make_exam_constraints(data.sections, data.rooms)
-        # Note: preference_model might be less relevant for exams or needs adaptation.
-        # We pass it anyway, but constraints are strict.
-    else:
-        domain = build_domain(raw_data)
-        constraints = make_constraints(data.sections, data.rooms, preference_model, blocked_blocks=blocked_blocks)
-    
     # Progress Logging Callback
-    import json
     progress_file = "ai_progress.json"
     
     def progress_reporter(msg):
@@ -112,18 +102,109 @@ def run_headless(input_file, mode_choice, output_file, ai_preference, course_typ
             except:
                 pass
 
-    solver = CSP(data.sections, domain, constraints, data.lecturers, preferences=preference_model, progress_callback=progress_reporter)
+    # Solution cache: a request whose loaded inputs and settings are unchanged gets the stored
+    # timetable. The key is taken after loading because loading can rewrite upstream files
+    # (availability mode "1" regenerates lecturer_availability.csv).
+    repair_from = data.config.get("solver_repair_from")
+    cache = SolutionCache()
+    cache_key = input_key({"model": model_file, "repair_from": repair_from}, {
+        "mode_choice": mode_choice, "ai_preference": ai_preference, "course_type": course_type,
+        "dept_choice": dept_choice, "avail_mode": avail_mode, "exam_mode": exam_mode,
+    }, data={"loaded": raw_data, "blocked_blocks": blocked_blocks})
+    cached = cache.get(cache_key)
+    if cached:
+        with open(output_file, "w", newline='', encoding='utf-8') as f:
+            f.write(cached["schedule"])
+        progress_reporter(f"PROGRESS:{len(data.sections)}/{len(data.sections)}|100.0")
+        print(f"[CACHE] Inputs unchanged since a previous run. Accuracy: {cached['accuracy']:.2f}%. Wrote {output_file}.")
+        return True, cached["accuracy"]
     
-    # Enable file logging for CSP processes
-    LOG_FILE = "csp_log.txt"
-    def file_logger(msg, is_error=False):
-        prefix = "[ERROR] " if is_error else "[INFO] "
-        with open(LOG_FILE, "a") as f:
-            f.write(f"{prefix}{msg}\n")
+    # 4. Solve
+    print("[AI] Solving CSP Constraints...")
+    
+    if exam_mode:
+        domain = build_exam_domain(raw_data)
+        constraints = make_exam_constraints(data.sections, data.rooms)
+        # Note: preference_model might be less relevant for exams or needs adaptation.
+        # We pass it anyway, but constraints are strict.
+    else:
+        domain = build_domain(raw_data, blocked_blocks)
+        constraints = make_constraints(data.sections, data.rooms, preference_model, blocked_blocks=blocked_blocks)
     
-    solver.log = file_logger # Override solver logging
+    # Interchangeable rooms are tried once per (day, slot) by the search
+    room_classes = room_equivalence_classes(raw_data, blocked_blocks)
+    
+    solver = CSP(data.sections, domain, constraints, data.lecturers, preferences=preference_model, progress_callback=progress_reporter,
+                 forward_checking=True, arc_consistency=True, backjumping=True,
+                 restarts=data.config.get("solver_restarts", True), seed=data.config.get("solver_seed"),
+                 improve_seconds=data.config.get("solver_improve_seconds", 0),
+                 room_classes=room_classes, phase_budgets=data.config.get("solver_phase_budgets"),
+                 log_level=data.config.get("solver_log_level", "INFO"))
+    
+    # Every engine logs through the solver's buffered log (csp_log.txt and the progress file)
+    file_logger = solver.log
+    
+    workers = int(data.config.get("solver_workers", 1) or 1)
+    engine = data.config.get("solver_engine", "backtracking")
+    decompose = data.config.get("solver_decompose", False)
+    # Picklable inputs for engines that rebuild the constraints in worker processes
+    problem = {
+        "sections": data.sections, "domains": domain, "lecturers": data.lecturers,
+        "rooms": data.rooms, "preferences": preference_model,
+        "blocked_blocks": blocked_blocks, "exam_mode": exam_mode,
+        "room_classes": room_classes,
+    }
+    # Warm start: keep last run's still-valid placements and re-solve only what changed (repair.py)
+    repairing = bool(repair_from) and os.path.exists(repair_from)
+    if repairing:
+        from repair import load_schedule, repair_schedule
+        previous = load_schedule(repair_from, raw_data, exam_mode=exam_mode)
+        solution = repair_schedule(solver, previous)
+    elif engine == "local_search":
+        from local_search import MinConflictsSolver
+        local_solver = MinConflictsSolver(data.sections, domain, constraints, data.lecturers,
+                                          preferences=preference_model, progress_callback=progress_reporter,
+                                          timeout_seconds=solver.timeout_seconds,
+                                          seed=data.config.get("solver_seed"))
+        local_solver.log = file_logger
+        solution = local_solver.solve()
+    elif engine == "two_phase":
+        from two_phase import TwoPhaseSolver
+        two_phase_solver = TwoPhaseSolver(data.sections, domain, constraints, data.lecturers, data.rooms,
+                                          preferences=preference_model, progress_callback=progress_reporter,
+                                          timeout_seconds=solver.timeout_seconds,
+                                          forward_checking=True, arc_consistency=True, backjumping=True,
+                                          restarts=data.config.get("solver_restarts", True),
+                                          seed=data.config.get("solver_seed"),
+                                          phase_budgets=data.config.get("solver_phase_budgets"))
+        two_phase_solver.slot_solver.log = file_logger
+        solution = two_phase_solver.solve()
+    elif decompose:
+        from decompose import solve_components
+        solution = solve_components(problem, constraints, workers=workers, timeout_seconds=solver.timeout_seconds,
+                                    seed=data.config.get("solver_seed"),
+                                    restarts=data.config.get("solver_restarts", True),
+                                    progress_callback=progress_reporter, log=file_logger)
+    elif workers > 1:
+        from portfolio import solve_portfolio
+        solution = solve_portfolio(problem, workers, timeout_seconds=solver.timeout_seconds,
+                                   seed=data.config.get("solver_seed"),
+                                   progress_callback=progress_reporter, log=file_logger)
+    else:
+        solution = solver.solve(allow_partial=data.config.get("solver_allow_partial", True))  # Runs the improvement phase itself
     
-    solution = solver.solve()
+    if solution and solver.unplaced:
+        # Out of time (or no full timetable exists): export what was placed, plus the rest for hand placement
+        accuracy = solver.calculate_accuracy(solution)
+        print(f"[PARTIAL] Placed {len(solution)} of {len(data.sections)} sections. Exporting to {output_file}...")
+        export_solution(solution, raw_data, output_file, blocked_blocks=blocked_blocks, exam_mode=exam_mode,
+                        unplaced=solver.unplaced)
+        file_logger(f"Partial schedule: {len(solver.unplaced)} sections left unplaced.", is_error=True)
+        solver.log_sink.close()
+        return True, accuracy
+    
+    if solution and not repairing and (engine in ("local_search", "two_phase") or decompose or workers > 1):
+        solution = solver.improve(solution)
     
     if solution:
         accuracy = solver.calculate_accuracy(solution)
@@ -132,6 +213,14 @@ def run_headless(input_file, mode_choice, output_file, ai_preference, course_typ
         
         # Log resolution
         file_logger(f"Successfully generated schedule with {accuracy:.2f}% accuracy.")
+        solver.log_sink.close()
+        
+        try:
+            with open(output_file, "r", newline='', encoding='utf-8') as f:
+                cache.put(cache_key, {"accuracy": accuracy, "schedule": f.read(),
+                                      "assignment": {sec_id: list(value) for sec_id, value in solution.items()}})
+        except OSError as e:
+            print(f"[WARNING] Could not cache the schedule: {e}")
         
         # Retrain (Only for class schedules, exams might skew historical data if mixed)
         if not exam_mode:
@@ -139,7 +228,10 @@ def run_headless(input_file, mode_choice, output_file, ai_preference, course_typ
         return True, accuracy
     else:
         print("[FAILURE] No valid schedule found within constraints.")
+        if solver.budget_result:
+            print(f"[FAILURE] {solver.budget_result.message()}")
         file_logger("Failed to find a valid schedule.", is_error=True)
+        solver.log_sink.close()
         return False, 0.0
 
 if __name__ == "__main__":
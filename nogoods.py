@@ -0,0 +1,63 @@
+from collections import OrderedDict
+from typing import Dict, Any, Optional, FrozenSet, Tuple
+
+Nogood = FrozenSet[Tuple[str, Any]]  # A set of (var_id, value) pairs that cannot all hold
+
+_MISSING = object()
+
+
+class NogoodStore:
+    """
+    Bounded store of learned nogoods with least-recently-used eviction.
+    Nogoods are indexed by each of their (var_id, value) pairs so a candidate
+    assignment is only tested against the nogoods that mention it.
+    """
+
+    def __init__(self, capacity: int = 5000, max_size: int = 20):
+        self.capacity = capacity
+        self.max_size = max_size  # Longer nogoods rarely match again; don't keep them
+        self.nogoods: "OrderedDict[Nogood, None]" = OrderedDict()
+        self.index: Dict[Tuple[str, Any], set] = {}
+        self.hits = 0
+
+    def __len__(self):
+        return len(self.nogoods)
+
+    def add(self, pairs: Dict[str, Any]) -> bool:
+        if not pairs or len(pairs) > self.max_size:
+            return False
+        nogood = frozenset(pairs.items())
+        if nogood in self.nogoods:
+            self.nogoods.move_to_end(nogood)
+            return False
+        self.nogoods[nogood] = None
+        for pair in nogood:
+            self.index.setdefault(pair, set()).add(nogood)
+        if len(self.nogoods) > self.capacity:
+            self._evict()
+        return True
+
+    def violated(self, assignment: Dict[str, Any], var_id: str, value: Any) -> Optional[set]:
+        """
+        Returns the other variables of a nogood that var_id=value would complete
+        under the current assignment, or None if no stored nogood applies.
+        """
+        candidates = self.index.get((var_id, value))
+        if not candidates:
+            return None
+        for nogood in candidates:
+            if all(other == var_id or assignment.get(other, _MISSING) == other_value
+                   for other, other_value in nogood):
+                self.hits += 1
+                self.nogoods.move_to_end(nogood)
+                return {other for other, _ in nogood if other != var_id}
+        return None
+
+    def _evict(self):
+        nogood, _ = self.nogoods.popitem(last=False)
+        for pair in nogood:
+            members = self.index.get(pair)
+            if members is not None:
+                members.discard(nogood)
+                if not members:
+                    del self.index[pair]
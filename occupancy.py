@@ -0,0 +1,121 @@
+from typing import Dict, Any, Optional
+from data_model import ClassSection
+
+# Scopes the index knows how to answer. Constraints built by constraints.make_constraints
+# carry one of these in their `scope` attribute so the solver can swap the O(n) scan
+# over the assignment for a dictionary lookup.
+INDEXED_SCOPES = ("lecturer", "room", "cohort", "exam_level")
+# Scopes whose checks depend only on the section's own value, never on other placements
+UNARY_SCOPES = ("blocked",)
+
+
+def _semester(sec: ClassSection) -> Optional[str]:
+    # Empty strings and None both mean "unknown semester" (conflicts with everything)
+    return sec.semester or None
+
+
+class OccupancyIndex:
+    """
+    (day, slot)-keyed occupancy counts for the sections currently in the assignment.
+    Must be kept in sync with the assignment through assign()/unassign().
+    """
+
+    def __init__(self, sections: Dict[str, ClassSection]):
+        self.sections = sections
+        self.lecturers: Dict[tuple, int] = {}  # (lecturer_id, day, slot) -> count
+        self.rooms: Dict[tuple, int] = {}  # (room_id, day, slot) -> count
+        self.cohorts: Dict[tuple, Dict[Optional[str], int]] = {}  # (cohort, day, slot) -> {semester: count}
+        self.levels: Dict[tuple, int] = {}  # (level, semester, day, slot) -> count (exam mode)
+        self.codes: Dict[tuple, int] = {}  # (course code, day, slot) -> count (custom conflicts)
+
+    def assign(self, var_id: str, value: Any):
+        self._update(var_id, value, 1)
+
+    def unassign(self, var_id: str, value: Any):
+        self._update(var_id, value, -1)
+
+    def _update(self, var_id: str, value: Any, delta: int):
+        day, slot, room_id = value
+        sec = self.sections[var_id]
+
+        key = (sec.lecturer_id, day, slot)
+        self.lecturers[key] = self.lecturers.get(key, 0) + delta
+
+        key = (room_id, day, slot)
+        self.rooms[key] = self.rooms.get(key, 0) + delta
+
+        sem = _semester(sec)
+        for cohort in sec.cohorts:
+            by_sem = self.cohorts.setdefault((cohort, day, slot), {})
+            by_sem[sem] = by_sem.get(sem, 0) + delta
+
+        key = (str(sec.course_level), str(sec.semester), day, slot)
+        self.levels[key] = self.levels.get(key, 0) + delta
+
+        key = (str(sec.course_code).strip().upper(), day, slot)
+        self.codes[key] = self.codes.get(key, 0) + delta
+
+    def conflicts(self, var_id: str, value: Any, scope: str) -> bool:
+        """
+        Returns True if placing var_id at value clashes with an indexed section
+        under the given scope. var_id itself must not be in the index.
+        """
+        day, slot, room_id = value
+        sec = self.sections[var_id]
+
+        if scope == "lecturer":
+            return self.lecturers.get((sec.lecturer_id, day, slot), 0) > 0
+
+        if scope == "room":
+            return self.rooms.get((room_id, day, slot), 0) > 0
+
+        if scope == "cohort":
+            sem = _semester(sec)
+            for cohort in sec.cohorts:
+                by_sem = self.cohorts.get((cohort, day, slot))
+                if not by_sem:
+                    continue
+                if sem is None:
+                    # Unknown semester clashes with any occupant of the cohort
+                    if any(count > 0 for count in by_sem.values()):
+                        return True
+                elif by_sem.get(sem, 0) > 0 or by_sem.get(None, 0) > 0:
+                    return True
+            return False
+
+        if scope == "exam_level":
+            return self.levels.get((str(sec.course_level), str(sec.semester), day, slot), 0) > 0
+
+        raise ValueError(f"Unknown occupancy scope: {scope}")
+
+    def conflict_count(self, var_id: str, value: Any, scope: str) -> int:
+        """
+        Like conflicts(), but counts the indexed sections var_id would clash with.
+        Used by local search, where the assignment is complete and may conflict.
+        """
+        day, slot, room_id = value
+        sec = self.sections[var_id]
+
+        if scope == "lecturer":
+            return self.lecturers.get((sec.lecturer_id, day, slot), 0)
+
+        if scope == "room":
+            return self.rooms.get((room_id, day, slot), 0)
+
+        if scope == "cohort":
+            sem = _semester(sec)
+            count = 0
+            for cohort in sec.cohorts:
+                by_sem = self.cohorts.get((cohort, day, slot))
+                if not by_sem:
+                    continue
+                if sem is None:
+                    count += sum(by_sem.values())
+                else:
+                    count += by_sem.get(sem, 0) + by_sem.get(None, 0)
+            return count
+
+        if scope == "exam_level":
+            return self.levels.get((str(sec.course_level), str(sec.semester), day, slot), 0)
+
+        raise ValueError(f"Unknown occupancy scope: {scope}")
@@ -0,0 +1,151 @@
+import os
+import sys
+import time
+import queue
+import multiprocessing
+from typing import Dict, List, Any, Optional, Callable
+
+from constraints import make_constraints, make_exam_constraints
+from csp import CSP, Assignment
+
+# Solver settings cycled across portfolio workers. Each worker also gets its own seed,
+# so even two workers with the same settings explore different parts of the search.
+PORTFOLIO_SETTINGS: List[Dict[str, Any]] = [
+    {"backjumping": True, "restarts": True, "restart_schedule": "luby"},
+    {"backjumping": True, "restarts": True, "restart_schedule": "geometric", "variable_ordering": "mrv_degree"},
+    {"backjumping": False, "restarts": True, "restart_schedule": "luby", "value_ordering": "random"},
+    {"backjumping": True, "restarts": False, "variable_ordering": "mrv_degree"},
+    {"backjumping": True, "restarts": True, "restart_schedule": "luby", "restart_base": 200, "value_ordering": "random"},
+    {"backjumping": False, "restarts": False},
+]
+
+
+class PortfolioCancelled(Exception):
+    """Raised inside a worker once another worker has won."""
+
+
+def portfolio_settings(workers: int, seed: Optional[int] = None) -> List[Dict[str, Any]]:
+    """One CSP keyword set per worker: the settings table in order, wrapping around, with distinct seeds."""
+    base_seed = seed if seed is not None else int(time.time())
+    settings = []
+    for i in range(workers):
+        worker_settings = dict(PORTFOLIO_SETTINGS[i % len(PORTFOLIO_SETTINGS)])
+        worker_settings["seed"] = base_seed + i
+        settings.append(worker_settings)
+    return settings
+
+
+def make_problem_constraints(problem: Dict[str, Any]) -> list:
+    """Builds the constraints for a picklable problem dict (see solve_portfolio)."""
+    if problem["exam_mode"]:
+        return make_exam_constraints(problem["sections"], problem["rooms"])
+    return make_constraints(problem["sections"], problem["rooms"], problem["preferences"],
+                            blocked_blocks=problem["blocked_blocks"])
+
+
+def _portfolio_worker(worker_id: int, settings: Dict[str, Any], problem: Dict[str, Any],
+                      timeout_seconds: int, results, cancel):
+    """
+    Runs one solver configuration in its own process.
+    Each worker rebuilds the constraints from the raw inputs rather than unpickling the parent's.
+    Messages to the parent: ("progress", worker_id, log line) and ("done", worker_id, solution or None).
+    """
+    # Diagnosis output from losing workers would interleave with the parent's console
+    sys.stdout = open(os.devnull, "w")
+
+    solver = CSP(problem["sections"], problem["domains"], make_problem_constraints(problem), problem["lecturers"],
+                 preferences=problem["preferences"], log_file=os.devnull,
+                 timeout_seconds=timeout_seconds, forward_checking=True,
+                 arc_consistency=True, room_classes=problem.get("room_classes"), **settings)
+
+    def worker_log(message: str, is_error: bool = False, level: Optional[int] = None):
+        # Every search loop logs regularly, so this doubles as the cancellation point
+        if cancel.is_set():
+            raise PortfolioCancelled()
+        if "PROGRESS:" in message:
+            results.put(("progress", worker_id, message))
+
+    solver.log = worker_log
+
+    try:
+        solution = solver.solve()
+    except PortfolioCancelled:
+        return
+    results.put(("done", worker_id, solution))
+
+
+def solve_portfolio(problem: Dict[str, Any], workers: int, timeout_seconds: int = 30,
+                    seed: Optional[int] = None,
+                    progress_callback: Optional[Callable[[str], None]] = None,
+                    log: Callable[[str], None] = print) -> Optional[Assignment]:
+    """
+    Runs differently configured solvers on the same problem in parallel processes.
+    The first feasible solution wins and the remaining workers are cancelled.
+
+    problem holds the picklable inputs: sections, domains, lecturers, rooms,
+    preferences, blocked_blocks, exam_mode and optionally room_classes.
+    Progress lines are forwarded to progress_callback whenever the best worker improves.
+    """
+    settings = portfolio_settings(workers, seed)
+    ctx = multiprocessing.get_context()
+    results = ctx.Queue()
+    cancel = ctx.Event()
+    processes = [ctx.Process(target=_portfolio_worker,
+                             args=(i, settings[i], problem, timeout_seconds, results, cancel),
+                             daemon=True)
+                 for i in range(workers)]
+    for process in processes:
+        process.start()
+    log(f"[Portfolio] Started {workers} solver workers.")
+
+    solution = None
+    finished = 0
+    best_pct = -1.0
+    # Workers enforce their own timeout; the grace period covers process start-up and AC-3
+    deadline = time.monotonic() + timeout_seconds + 10
+    while finished < workers and time.monotonic() < deadline:
+        try:
+            kind, worker_id, payload = results.get(timeout=0.5)
+        except queue.Empty:
+            if not any(process.is_alive() for process in processes) and results.empty():
+                break  # A worker died without reporting
+            continue
+
+        if kind == "progress":
+            try:
+                pct = float(payload.split("PROGRESS:")[1].strip().split("|")[1])
+            except (IndexError, ValueError):
+                continue
+            if pct > best_pct:
+                best_pct = pct
+                if progress_callback:
+                    progress_callback(payload)
+        elif kind == "done":
+            finished += 1
+            if payload is not None:
+                solution = payload
+                log(f"[Portfolio] Worker {worker_id} won with settings {settings[worker_id]}.")
+                break
+
+    cancel.set()
+    _shutdown(processes, results)
+    if solution is None:
+        log("[Portfolio] No worker found a solution.")
+    return solution
+
+
+def _shutdown(processes: list, results, grace_seconds: float = 2.0):
+    """Waits briefly for cancelled workers to exit, draining the queue so none block on a full pipe."""
+    deadline = time.monotonic() + grace_seconds
+    while time.monotonic() < deadline and any(process.is_alive() for process in processes):
+        try:
+            while True:
+                results.get_nowait()
+        except queue.Empty:
+            pass
+        for process in processes:
+            process.join(timeout=0.05)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+        process.join()
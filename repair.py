@@ -0,0 +1,169 @@
+import csv
+import os
+import time
+from typing import Dict, List, Optional, Callable, Set
+
+import numpy as np
+
+from export_data import SLOT_TIME, EXAM_SLOT_TIME
+from occupancy import OccupancyIndex
+from domains import DomainGrid
+from csp import CSP, Assignment
+
+
+def load_schedule(path: str, data: dict, exam_mode: bool = False) -> Assignment:
+    """
+    Reads a schedule written by export_data.export_solution back into
+    {section id: (day, slot, room_id)}.
+    Section ids are input row numbers and shift when the input is edited, so rows are
+    matched to sections by course code, title and lecturer (in order, for repeated
+    sections). Rows that match no section, such as merged general-schedule blocks,
+    or whose room, day or time is unknown, are skipped.
+    """
+    by_key: Dict[tuple, List[str]] = {}
+    for sec in data["sections"]:
+        by_key.setdefault((sec.course_code, sec.section_title, sec.lecturer_id), []).append(sec.id)
+    days = {name: i for i, name in enumerate(data["config"]["days"])}
+    slot_times = EXAM_SLOT_TIME if exam_mode else SLOT_TIME
+    slots = {f"{start} - {end}": slot for slot, (start, end) in slot_times.items()}
+    rooms = data["rooms"]
+
+    previous: Assignment = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            key = (row.get("Course Code", "").strip(), row.get("Course Title", "").strip(),
+                   row.get("Lecturer Name", "").strip().replace(" ", "_"))
+            candidates = by_key.get(key)
+            if not candidates:
+                continue
+            day_name = row.get("Day", "").strip()
+            day = days.get(day_name)
+            if day is None and day_name.startswith("Day "):
+                day = int(day_name[4:]) - 1  # Extended exam period, see export_solution
+            slot = slots.get(row.get("Time", "").strip())
+            room_id = row.get("Room Name", "").strip().replace(" ", "_")
+            if day is None or slot is None or room_id not in rooms:
+                continue
+            previous[candidates.pop(0)] = (day, slot, room_id)
+    return previous
+
+
+def split_previous(solver: CSP, previous: Assignment):
+    """
+    Splits the previous placements into those still valid together, and the sections
+    that need a new value: new sections, and those whose value left their domain or
+    clashes with a placement kept before it. Sections with the fewest values are kept
+    first, so pre-scheduled ones win any clash.
+    Returns (kept assignment, ids to re-solve).
+    """
+    grid = solver.live_domains
+    occupancy = OccupancyIndex(solver.vars_by_id)
+    kept: Assignment = {}
+    for var in sorted(solver.variables, key=lambda var: len(solver.domains[var.id])):
+        value = previous.get(var.id)
+        if value is None or value[2] not in grid.room_index:
+            continue
+        try:
+            if not grid.contains(var.id, value):
+                continue
+        except IndexError:  # Day or slot outside this run's grid
+            continue
+        if any(occupancy.conflicts(var.id, value, scope) for scope in solver.indexed_scopes):
+            continue
+        kept[var.id] = value
+        if not all(c(kept, var.id, value) for c in solver.generic_constraints):
+            del kept[var.id]
+            continue
+        occupancy.assign(var.id, value)
+    dirty = [var.id for var in solver.variables if var.id not in kept]
+    return kept, dirty
+
+
+def filter_fixed(solver: CSP, domains: Dict[str, list], fixed: Assignment) -> Dict[str, list]:
+    """
+    Drops every value that clashes with a fixed placement, pruning the way forward
+    checking does around a placed section: its conflict-graph neighbours lose its
+    (day, slot), and every section loses its exact value when rooms are exclusive.
+    """
+    grid = DomainGrid(domains)
+    everyone = np.arange(len(grid.var_ids))
+    for var_id, (day, slot, room_id) in fixed.items():
+        if day >= grid.shape[0] or slot >= grid.shape[1]:
+            continue
+        neighbours = [other for other in solver.neighbour_sets[var_id] if other in grid.var_index]
+        grid.remove_slot(grid.indices(neighbours), day, slot)
+        if "room" in solver.indexed_scopes:
+            grid.remove_value(everyone, (day, slot, room_id))
+    return {var_id: [value for value in values if grid.contains(var_id, value)]
+            for var_id, values in domains.items()}
+
+
+def solve_subset(solver: CSP, free: Set[str], fixed: Assignment, previous: Assignment,
+                 timeout_seconds: float) -> Optional[Assignment]:
+    """
+    Solves the free sections around the fixed placements: their domains lose every value
+    that clashes with a fixed section, and previous values are tried first.
+    """
+    variables = [var for var in solver.variables if var.id in free]
+    domains = {var.id: solver.domains[var.id] for var in variables}
+    if fixed:
+        domains = filter_fixed(solver, domains, fixed)
+
+    sub = CSP(variables, domains, solver.constraints, solver.lecturers, preferences=solver.preferences,
+              log_file=os.devnull, timeout_seconds=timeout_seconds, forward_checking=True,
+              arc_consistency=True, backjumping=True, restarts=solver.restarts, seed=solver.seed,
+              preferred_values=previous)
+    sub.log = solver.log
+    sub.run_diagnosis = lambda: None  # A failed neighbourhood is widened, not reported
+    result = sub.solve()
+    if result is None:
+        return None
+
+    # Untagged constraints may relate free and fixed sections: check them on the merged timetable
+    merged = {**fixed, **result}
+    if not all(c(merged, var_id, value) for var_id, value in result.items() for c in solver.generic_constraints):
+        return None
+    return merged
+
+
+def repair_schedule(solver: CSP, previous: Assignment, widen_rounds: int = 2,
+                    log: Optional[Callable[[str], None]] = None) -> Optional[Assignment]:
+    """
+    Warm start from a previous schedule (see load_schedule): placements still valid
+    stay fixed and only the changed or clashing sections are solved again. If they
+    cannot be placed, the sections sharing a lecturer or cohort with them are freed
+    too, one ring at a time for up to widen_rounds rounds. After that the whole
+    problem is solved with the previous placements only preferred.
+
+    solver supplies the problem and its options; its timeout_seconds bounds the whole repair.
+    Returns a complete assignment or None.
+    """
+    log = log or solver.log
+    start = time.monotonic()
+    kept, dirty = split_previous(solver, previous)
+    log(f"[Repair] {len(kept)} of {len(solver.variables)} previous placements kept, {len(dirty)} sections to re-solve.")
+    if not dirty:
+        return kept
+
+    free = set(dirty)
+    everything = {var.id for var in solver.variables}
+    for round_number in range(widen_rounds + 2):
+        remaining = solver.timeout_seconds - (time.monotonic() - start)
+        if remaining <= 0:
+            break
+        fixed = {var_id: value for var_id, value in kept.items() if var_id not in free}
+        result = solve_subset(solver, free, fixed, previous, remaining)
+        if result is not None:
+            moved = sum(1 for var_id, value in result.items() if previous.get(var_id) != value)
+            log(f"[Repair] Solved with {len(free)} free sections; {moved} placements differ from the previous schedule.")
+            return result
+        if free == everything:
+            break
+        widened = free.union(*(solver.neighbour_sets[var_id] for var_id in free))
+        if round_number >= widen_rounds or widened == free:
+            widened = everything
+        log(f"[Repair] {len(free)} free sections could not be placed; widening to {len(widened)}.")
+        free = widened
+
+    log("[Repair] No repaired schedule found.")
+    return None
@@ -0,0 +1,136 @@
+import dataclasses
+import hashlib
+import json
+import os
+from typing import Dict, Any, Optional
+
+# Bump when the solver can produce a different timetable for the same inputs,
+# so entries written by older code stop matching.
+CACHE_VERSION = 2
+
+TEXT_EXTENSIONS = (".csv", ".json", ".txt")
+
+
+def normalized_content(path: str) -> bytes:
+    """
+    File content with formatting noise removed: for text files the BOM, line-ending
+    style, trailing whitespace and blank lines do not change the digest.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if not path.lower().endswith(TEXT_EXTENSIONS):
+        return data
+    text = data.decode("utf-8-sig", errors="replace")
+    lines = [line.rstrip() for line in text.splitlines()]
+    return "\n".join(line for line in lines if line).encode("utf-8")
+
+
+def file_digest(path: Optional[str]) -> str:
+    if not path or not os.path.exists(path):
+        return "missing"
+    return hashlib.sha256(normalized_content(path)).hexdigest()
+
+
+def canonical(value: Any) -> Any:
+    """
+    JSON-ready form of loaded data that does not depend on set or dict ordering:
+    dataclasses become dicts of their fields, sets become sorted lists.
+    """
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return {f.name: canonical(getattr(value, f.name)) for f in dataclasses.fields(value)}
+    if isinstance(value, dict):
+        return {str(k): canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [canonical(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((canonical(v) for v in value), key=repr)
+    return value
+
+
+def input_key(files: Dict[str, Optional[str]], settings: Dict[str, Any], data: Any = None) -> str:
+    """
+    Stable hash of everything a run depends on: the loaded problem data (sections,
+    rooms, lecturers and their availability, config, ...), the content of each
+    upstream file that is read outside of loading (by role, e.g. {"model":
+    "scheduling_model.pkl"}; None or a missing path counts as absent) and the
+    request's solver settings. Any change to these gives a new key, so stale
+    entries are never hit and simply age out of the cache.
+    """
+    payload = {
+        "version": CACHE_VERSION,
+        "files": {role: file_digest(path) for role, path in sorted(files.items())},
+        "settings": settings,
+        "data": canonical(data),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class SolutionCache:
+    """
+    On-disk cache of finished runs, one JSON file per input_key().
+    Reads refresh an entry's modification time, and writes evict the least recently
+    used entries until the directory is back under max_bytes.
+    """
+
+    def __init__(self, directory: str = "solution_cache", max_bytes: int = 50 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self.path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            # Unreadable or half-written: drop it and solve again
+            self.discard(key)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def put(self, key: str, entry: Dict[str, Any]):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)  # Atomic: concurrent readers see the old entry or the new one
+        self.evict(keep=path)
+
+    def discard(self, key: str):
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+    def evict(self, keep: Optional[str] = None):
+        """Removes least recently used entries until the cache fits in max_bytes (never `keep`)."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
@@ -0,0 +1,121 @@
+from collections import deque
+from logging.handlers import QueueListener, MemoryHandler
+from typing import Callable, Optional, Union
+import logging
+import queue
+import time
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+
+
+class _RingBuffer(logging.Handler):
+    """Keeps the last `capacity` formatted lines in memory."""
+
+    def __init__(self, capacity: int):
+        super().__init__()
+        self.lines = deque(maxlen=capacity)
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+
+
+class _Callback(logging.Handler):
+    """Passes each formatted line to a progress callback."""
+
+    def __init__(self, callback: Callable[[str], None]):
+        super().__init__()
+        self.callback = callback
+
+    def emit(self, record):
+        try:
+            self.callback(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+
+class _Listener(QueueListener):
+    """Turns the (created, level, message) tuples queued by SolverLog into log records."""
+
+    def __init__(self, name: str, log_queue, *handlers):
+        super().__init__(log_queue, *handlers)
+        self.name = name
+
+    def prepare(self, item):
+        created, level, message = item
+        record = logging.LogRecord(self.name, level, "", 0, message, None, None)
+        record.created = created
+        record.msecs = (created - int(created)) * 1000
+        return record
+
+
+class SolverLog:
+    """
+    Non-blocking log for a solver run.
+    write() only puts (time, level, message) on an in-memory queue. A QueueListener
+    thread then formats it, appends it to the log file in batches of `batch_size`
+    lines (errors go straight through), keeps the last `capacity` lines in a ring
+    buffer (see recent()) and calls progress_callback with the formatted line.
+
+    Messages below `level` are dropped before anything is queued. Hot paths should
+    check is_enabled() before building a message. flush() drains the queue and writes the
+    file; close() also releases the file, and solvers call it on the way out of
+    solve(). Both are safe to follow with more writes: the listener restarts and
+    the file reopens (in append mode) on the next one.
+    """
+
+    def __init__(self, log_file: str,
+                 level: Union[int, str] = logging.INFO,
+                 progress_callback: Optional[Callable[[str], None]] = None,
+                 header: Optional[str] = None,
+                 capacity: int = 1000,
+                 batch_size: int = 256):
+        if header is not None:
+            with open(log_file, 'w') as f:
+                f.write(header + "\n")
+
+        if isinstance(level, str):
+            name, level = level, logging.getLevelName(level.upper())
+            if not isinstance(level, int):
+                raise ValueError(f"Unknown log level: {name}")
+        self.level = level
+        self.queue = queue.SimpleQueue()
+
+        formatter = logging.Formatter(LOG_FORMAT, "%H:%M:%S")
+        self.file_handler = logging.FileHandler(log_file, 'a', delay=True)
+        self.file_handler.setFormatter(formatter)
+        self.file_buffer = MemoryHandler(batch_size, flushLevel=logging.ERROR, target=self.file_handler)
+        self.ring = _RingBuffer(capacity)
+        self.ring.setFormatter(formatter)
+        handlers = [self.file_buffer, self.ring]
+        if progress_callback:
+            callback = _Callback(progress_callback)
+            callback.setFormatter(formatter)
+            handlers.append(callback)
+        self.listener = _Listener(f"solver:{log_file}", self.queue, *handlers)
+        self.running = False
+
+    def is_enabled(self, level: int) -> bool:
+        return level >= self.level
+
+    def write(self, level: int, message: str):
+        if level < self.level:
+            return
+        if not self.running:
+            self.listener.start()
+            self.running = True
+        self.queue.put((time.time(), level, message))
+
+    def recent(self, count: Optional[int] = None) -> list:
+        """The last `count` (default: all buffered) formatted lines, oldest first."""
+        lines = list(self.ring.lines)
+        return lines if count is None else lines[-count:]
+
+    def flush(self):
+        if self.running:
+            self.listener.stop()  # Handles everything queued so far, then joins the thread
+            self.running = False
+        self.file_buffer.flush()
+
+    def close(self):
+        self.flush()
+        self.file_handler.close()
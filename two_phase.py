@@ -0,0 +1,222 @@
+from typing import List, Dict, Any, Callable, Optional, Tuple
+import numpy as np
+from data_model import ClassSection, Lecturer, Room
+from occupancy import INDEXED_SCOPES, UNARY_SCOPES
+from conflict_graph import GRAPH_SCOPES
+from csp import CSP, Assignment, Domain, Constraint
+
+ANY_ROOM = "*"  # Room placeholder in phase-one values: (day, slot, ANY_ROOM)
+
+
+def match_rooms(members: List[str], options: Callable[[str], List[str]]) -> Optional[Dict[str, str]]:
+    """
+    Maximum bipartite matching of sections to rooms (augmenting paths).
+    Sections are matched in the given order and each tries its rooms in the order
+    given, so earlier sections and earlier rooms win when there is a choice.
+    Returns {section id: room_id}, or None if some section cannot get a room.
+    """
+    owner: Dict[str, str] = {}  # room_id -> section id
+    for var_id in members:
+        if not _augment(owner, var_id, options, set()):
+            return None
+    return {var_id: room_id for room_id, var_id in owner.items()}
+
+
+def _augment(owner: Dict[str, str], var_id: str, options: Callable[[str], List[str]], seen: set) -> bool:
+    """Finds var_id a room, moving earlier sections along an augmenting path if needed."""
+    for room_id in options(var_id):
+        if room_id in seen:
+            continue
+        seen.add(room_id)
+        if room_id not in owner or _augment(owner, owner[room_id], options, seen):
+            owner[room_id] = var_id
+            return True
+    return False
+
+
+def make_slot_capacity_constraint(room_options: Dict[str, Dict[Tuple[int, int], List[str]]]) -> Constraint:
+    """
+    Phase-one constraint: the sections sharing a (day, slot) must fit into distinct
+    candidate rooms, i.e. a room matching exists for them. This is exact, so
+    phase two can never fail on a phase-one solution.
+    """
+    def slot_capacity(assignment, var_id, value):
+        day, slot, _ = value
+        members = [other for other, other_value in assignment.items()
+                   if other_value[0] == day and other_value[1] == slot]
+        # Hall's condition holds trivially while every member has at least as many rooms as there are members
+        if all(len(room_options[other][(day, slot)]) >= len(members) for other in members):
+            return True
+        return match_rooms(members, lambda other: room_options[other][(day, slot)]) is not None
+
+    slot_capacity.scope = "slot_capacity"
+    return slot_capacity
+
+
+class SlotCSP(CSP):
+    """
+    Phase-one CSP over (day, slot, ANY_ROOM) values. Besides the lecturer/cohort
+    pruning, forward checking removes a (day, slot) from every unassigned section
+    that would no longer fit into that slot's rooms, and backjumping blames the
+    sections holding a slot for such removals.
+    """
+
+    def __init__(self, *args, room_options: Dict[str, Dict[Tuple[int, int], List[str]]],
+                 rooms_exclusive: bool = True, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.room_options = room_options
+        self.rooms_exclusive = rooms_exclusive
+        self.slot_members: Dict[Tuple[int, int], List[str]] = {}
+
+    def assign(self, assignment: Assignment, var_id: str, value: Any) -> Tuple[int, bool]:
+        # Recorded first: forward_check, called from assign, reads the slot's members
+        self.slot_members.setdefault(value[:2], []).append(var_id)
+        return super().assign(assignment, var_id, value)
+
+    def unassign(self, assignment: Assignment, var_id: str, mark: int):
+        value = assignment[var_id]
+        super().unassign(assignment, var_id, mark)
+        self.slot_members[value[:2]].remove(var_id)
+
+    def forward_check(self, assignment: Assignment, var_id: str, value: Any) -> bool:
+        ok = super().forward_check(assignment, var_id, value)
+        if not self.rooms_exclusive or (not ok and self.forward_checking):
+            return ok
+
+        day, slot, _ = value
+        grid = self.live_domains
+        candidates = np.flatnonzero(grid.mask[:, day, slot, 0] & ~grid.assigned)
+        if not len(candidates):
+            return ok
+
+        def options(other: str) -> List[str]:
+            return self.room_options[other][(day, slot)]
+
+        members = self.slot_members[(day, slot)]
+        fewest = min(len(options(other)) for other in members)
+        owner = {room_id: other for other, room_id in match_rooms(members, options).items()}
+        full = []
+        for i in candidates.tolist():
+            other = grid.var_ids[i]
+            # Hall's condition is trivially met while everyone has more rooms than there are sections
+            if min(fewest, len(options(other))) > len(members):
+                continue
+            if not _augment(dict(owner), other, options, set()):
+                full.append(i)
+        if not full:
+            return ok
+
+        changed = grid.remove_slot(np.array(full, dtype=np.intp), day, slot)
+        if len(changed) and not grid.sizes[changed].all():
+            if self.wiped_out_var is None:
+                self.wiped_out_var = grid.var_ids[changed[grid.sizes[changed] == 0][0]]
+            return False
+        return ok
+
+    def explain_pruned(self, var_id: str) -> set:
+        # A slot with no lecturer/cohort blocker may have been closed for capacity:
+        # blame everyone holding it (a safe superset of the real cause).
+        culprits = super().explain_pruned(var_id)
+        neighbours = self.neighbour_sets[var_id]
+        for day_slot in self.domain_slots[var_id]:
+            holders = self.slot_members.get(day_slot)
+            if holders and not any(other in neighbours for other in holders):
+                culprits.update(holders)
+        culprits.discard(var_id)
+        return culprits
+
+
+class TwoPhaseSolver:
+    """
+    Solves timeslots first and rooms second.
+    Phase one runs the usual CSP over (day, slot) values only, with a per-slot room
+    capacity constraint in place of room clashes, so the search no longer branches
+    over interchangeable rooms. Phase two gives the sections in each (day, slot)
+    their rooms by bipartite matching: requested rooms and larger classes first,
+    each trying rooms that fit its enrollment before those that don't, and
+    otherwise in build_domain's order (requested room, departmental rooms, rest).
+    solve() returns the same {section id: (day, slot, room_id)} mapping as CSP.solve().
+    """
+
+    def __init__(self,
+                 variables: List[ClassSection],
+                 domains: Domain,
+                 constraints: List[Constraint],
+                 lecturers: Dict[str, Lecturer],
+                 rooms: Dict[str, Room],
+                 preferences: Dict = None,
+                 progress_callback: Optional[Callable[[str], None]] = None,
+                 log_file: str = "csp_log.txt",
+                 **csp_options):
+        self.variables = variables
+        self.rooms = rooms
+        self.vars_by_id = {var.id: var for var in variables}
+
+        scopes = [getattr(c, "scope", None) for c in constraints]
+        untagged = [scope for scope in scopes if scope not in INDEXED_SCOPES + UNARY_SCOPES + GRAPH_SCOPES]
+        if untagged:
+            raise ValueError("Two-phase solving needs scope-tagged constraints")
+        self.rooms_exclusive = "room" in scopes
+
+        # Candidate rooms per (day, slot), in domain order, after the unary (blocked) checks
+        unary = [c for c in constraints if getattr(c, "scope", None) in UNARY_SCOPES]
+        self.room_options: Dict[str, Dict[Tuple[int, int], List[str]]] = {}
+        for var in variables:
+            by_slot = self.room_options[var.id] = {}
+            for value in domains[var.id]:
+                if all(c({var.id: value}, var.id, value) for c in unary):
+                    by_slot.setdefault(value[:2], []).append(value[2])
+
+        slot_domains = {var_id: [(day, slot, ANY_ROOM) for day, slot in by_slot]
+                        for var_id, by_slot in self.room_options.items()}
+        slot_constraints = [c for c in constraints if getattr(c, "scope", None) in GRAPH_SCOPES]
+        if self.rooms_exclusive:
+            slot_constraints.append(make_slot_capacity_constraint(self.room_options))
+
+        self.slot_solver = SlotCSP(variables, slot_domains, slot_constraints, lecturers,
+                                   preferences=preferences, progress_callback=progress_callback,
+                                   log_file=log_file, room_options=self.room_options,
+                                   rooms_exclusive=self.rooms_exclusive, **csp_options)
+
+    def log(self, message: str, is_error: bool = False, level: Optional[int] = None):
+        # Shares the phase-one solver's log, including any override of it
+        self.slot_solver.log(message, is_error, level)
+
+    def room_order(self, var_id: str, day: int, slot: int) -> List[str]:
+        enrollment = self.vars_by_id[var_id].enrollment
+        options = self.room_options[var_id][(day, slot)]
+        # Stable sort: rooms that fit first, otherwise keep the domain's preference order
+        return sorted(options, key=lambda room_id: room_id in self.rooms and self.rooms[room_id].capacity < enrollment)
+
+    def assign_rooms(self, times: Assignment) -> Optional[Assignment]:
+        by_slot: Dict[Tuple[int, int], List[str]] = {}
+        for var_id, (day, slot, _) in times.items():
+            by_slot.setdefault((day, slot), []).append(var_id)
+
+        assignment: Assignment = {}
+        for (day, slot), members in by_slot.items():
+            orders = {var_id: self.room_order(var_id, day, slot) for var_id in members}
+            if not self.rooms_exclusive:
+                for var_id in members:
+                    assignment[var_id] = (day, slot, orders[var_id][0])
+                continue
+            members.sort(key=lambda var_id: (not self.vars_by_id[var_id].requested_room,
+                                             -self.vars_by_id[var_id].enrollment))
+            matching = match_rooms(members, orders.get)
+            if matching is None:
+                self.log(f"No room matching for {len(members)} sections at day {day}, slot {slot}.", is_error=True)
+                return None
+            for var_id, room_id in matching.items():
+                assignment[var_id] = (day, slot, room_id)
+        return assignment
+
+    def solve(self) -> Assignment | None:
+        self.log(f"Two-phase solve: {len(self.variables)} sections, timeslots first.")
+        times = self.slot_solver.solve()
+        if times is None:
+            return None
+        assignment = self.assign_rooms(times)
+        if assignment is not None:
+            self.log("Rooms assigned by per-slot matching.")
+        self.slot_solver.log_sink.close()
+        return assignment
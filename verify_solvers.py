@@ -0,0 +1,235 @@
+import contextlib
+import io
+import os
+import random
+import sys
+from data_model import ClassSection, Lecturer, Room, Course
+from builder import build_domain, build_exam_domain, room_equivalence_classes
+from constraints import (make_constraints, make_exam_constraints, no_lecturer_conflict, no_room_conflict,
+                         no_student_cohort_conflict, no_blocked_slot_conflict, no_exam_level_clash,
+                         no_custom_conflict)
+from csp import CSP
+from local_search import MinConflictsSolver
+from two_phase import TwoPhaseSolver
+from portfolio import solve_portfolio
+from decompose import solve_components
+from repair import repair_schedule
+
+# Solves small random timetables with every engine and option combination and checks
+# each result against the reference functions in constraints.py (not the constraint
+# objects or indexes the solvers use). Run: python verify_solvers.py
+
+failures = 0
+
+
+def report(label, ok, detail=""):
+    global failures
+    if ok:
+        print(f"PASS: {label}")
+    else:
+        failures += 1
+        print(f"FAIL: {label} {detail}")
+
+
+def quietly(run):
+    """Calls run() with the solvers' console output swallowed; an exception comes back as the result."""
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return run()
+    except Exception as e:
+        return e
+
+
+def random_problem(seed, n=30, n_rooms=8, exam_mode=False):
+    """A small random instance in load_data's format, plus general-schedule blocks and custom conflicts."""
+    rnd = random.Random(seed)
+    rooms = {}
+    for i in range(n_rooms):
+        name = rnd.choice(["CS ", "LAB ", "Hall ", "CH "]) + str(i)
+        rooms[name.replace(" ", "_")] = Room(id=name.replace(" ", "_"), name=name, capacity=rnd.choice([30, 50, 100]),
+                                             room_type="lecture", available_time_slots=[])
+    lecturers = {}
+    for i in range(max(3, n // 4)):
+        days = rnd.sample(range(5), rnd.randint(3, 5))
+        lecturers[f"L{i}"] = Lecturer(id=f"L{i}", name=f"Lecturer {i}",
+                                      available_time_slots=[(day, slot) for day in days for slot in range(3)])
+    sections, courses = [], {}
+    for i in range(n):
+        code = f"{rnd.choice(['COSC', 'NURS', 'MATH'])} {100 + i}"
+        courses[code] = Course(code=code, title=code, credit_hours="3", required_room_type="lecture", required_lessons=3)
+        sections.append(ClassSection(id=f"S{i}", course_code=code, lecturer_id=rnd.choice(list(lecturers)),
+                                     section_title=f"{code} [Sec A]", course_type="Departmental",
+                                     course_level=str(rnd.choice([100, 200, 300, 400])),
+                                     enrollment=rnd.choice([20, 40, 60]),
+                                     cohorts={f"Prog{rnd.randrange(4)}_{rnd.choice([100, 200])}"},
+                                     semester=rnd.choice([None, "1", "2"]),
+                                     departmental_group={"COSC": "CS", "NURS": "Nursing"}.get(code[:4], "Other")))
+    data = {
+        "sections": sections, "lecturers": lecturers, "rooms": rooms, "courses": courses,
+        "special_rooms": {}, "course_cohorts": {},
+        "config": {"days": ["Mon", "Tue", "Wed", "Thu", "Fri"], "slots_per_day": 4, "strict_capacity": False},
+    }
+    blocks, custom = [], {}
+    if not exam_mode:
+        names = [room.name for room in rooms.values()]
+        blocks = [{"code": None, "level": str(rnd.choice([100, 200, 300, 400])), "semester": rnd.choice([None, "1", "2"]),
+                   "day": rnd.randrange(5), "slot": rnd.randrange(4), "room": rnd.choice([None] + names)}
+                  for _ in range(4)]
+        codes = [sec.course_code for sec in sections]
+        custom = {(rnd.choice(codes), rnd.choice(codes)): 1.0 for _ in range(3)}
+    return data, blocks, custom
+
+
+def violations(assignment, data, domain, blocks=None, custom=None, exam_mode=False):
+    """Every rule the assignment breaks, per the reference functions."""
+    sections = {sec.id: sec for sec in data["sections"]}
+    partners = {}
+    for first, second in (custom or {}):
+        first, second = first.strip().upper(), second.strip().upper()
+        partners.setdefault(first, set()).add(second)
+        partners.setdefault(second, set()).add(first)
+    found = []
+    for var_id, value in assignment.items():
+        value = tuple(value)
+        if value not in domain[var_id]:
+            found.append(f"{var_id} outside its domain")
+        checks = [
+            ("lecturer", no_lecturer_conflict(assignment, var_id, value, sections)),
+            ("room", no_room_conflict(assignment, var_id, value)),
+            ("blocked", no_blocked_slot_conflict(assignment, var_id, value, sections, blocks, data["rooms"])),
+            ("custom", no_custom_conflict(assignment, var_id, value, sections, partners)),
+        ]
+        if exam_mode:
+            checks.append(("exam level", no_exam_level_clash(assignment, var_id, value, sections)))
+        else:
+            checks.append(("cohort", no_student_cohort_conflict(assignment, var_id, value, sections)))
+        found.extend(f"{var_id} {rule} clash" for rule, ok in checks if not ok)
+    return found
+
+
+def check(label, result, data, domain, blocks=None, custom=None, exam_mode=False, complete=True):
+    if isinstance(result, Exception):
+        report(label, False, f"(raised {result!r})")
+        return
+    if result is None:
+        report(label, False, "(no timetable)")
+        return
+    if complete and len(result) != len(data["sections"]):
+        report(label, False, f"(placed {len(result)} of {len(data['sections'])})")
+        return
+    broken = violations(result, data, domain, blocks, custom, exam_mode)
+    report(label, not broken, f"({len(broken)} violations, e.g. {broken[:3]})")
+
+
+CSP_OPTIONS = {
+    "chronological": {},
+    "forward checking": {"forward_checking": True},
+    "forward checking + AC-3": {"forward_checking": True, "arc_consistency": True},
+    "recursive engine": {"iterative": False, "forward_checking": True},
+    "backjumping": {"backjumping": True},
+    "backjumping + FC + AC-3 + luby restarts": {"backjumping": True, "forward_checking": True,
+                                                "arc_consistency": True, "restarts": True, "seed": 3},
+    "geometric restarts, random values": {"restarts": True, "restart_schedule": "geometric",
+                                          "value_ordering": "random", "seed": 4},
+    "mrv_degree": {"variable_ordering": "mrv_degree", "forward_checking": True},
+    "improvement phase": {"forward_checking": True, "improve_seconds": 1},
+}
+
+
+def run_all():
+    # Empty input: no sections, no rooms. Every engine should return an empty timetable.
+    print("Empty input...")
+    empty = {"sections": [], "lecturers": {}, "rooms": {}, "courses": {}, "special_rooms": {},
+             "course_cohorts": {}, "config": {"days": ["Mon"], "slots_per_day": 4}}
+    constraints = make_constraints([], {}, {})
+    problem = {"sections": [], "domains": {}, "lecturers": {}, "rooms": {}, "preferences": {},
+               "blocked_blocks": [], "exam_mode": False, "room_classes": {}}
+    engines = {
+        "backtracking": lambda: CSP([], {}, constraints, {}, log_file=os.devnull).solve(),
+        "backjumping": lambda: CSP([], {}, constraints, {}, log_file=os.devnull, backjumping=True,
+                                   forward_checking=True, arc_consistency=True, restarts=True).solve(),
+        "local search": lambda: MinConflictsSolver([], {}, constraints, {}, log_file=os.devnull,
+                                                   timeout_seconds=5).solve(),
+        "two-phase": lambda: TwoPhaseSolver([], {}, constraints, {}, {}, log_file=os.devnull,
+                                            timeout_seconds=5).solve(),
+        "portfolio": lambda: solve_portfolio(problem, 2, timeout_seconds=5),
+        "decompose": lambda: solve_components(problem, constraints, timeout_seconds=5),
+        "repair": lambda: repair_schedule(CSP([], {}, constraints, {}, log_file=os.devnull), {}),
+        "domain builder": lambda: build_domain(empty),
+    }
+    for name, run in engines.items():
+        result = quietly(run)
+        report(f"empty input, {name}", result == {}, f"(got {result!r})")
+
+    # The last instance is the tight one (50 sections, 3 rooms): with unlucky tie-breaking
+    # some engines need thousands of nodes, so every run below is seeded
+    for seed, n, n_rooms in ((1, 30, 8), (2, 30, 8), (3, 30, 8), (4, 50, 3)):
+        data, blocks, custom = random_problem(seed, n, n_rooms)
+        sections = data["sections"]
+        preferences = {"custom_conflicts": custom}
+        domain = quietly(lambda: build_domain(data, blocks))
+        constraints = make_constraints(sections, data["rooms"], preferences, blocked_blocks=blocks)
+        room_classes = room_equivalence_classes(data, blocks)
+        print(f"\nRandom instance {seed}: {len(sections)} sections, {len(data['rooms'])} rooms...")
+
+        def args(**options):
+            options.setdefault("seed", seed)
+            return dict(preferences=preferences, log_file=os.devnull, timeout_seconds=10, **options)
+
+        for name, options in CSP_OPTIONS.items():
+            result = quietly(lambda: CSP(sections, domain, constraints, data["lecturers"], **args(**options)).solve())
+            check(f"seed {seed}, {name}", result, data, domain, blocks, custom)
+        result = quietly(lambda: CSP(sections, domain, constraints, data["lecturers"],
+                                     **args(forward_checking=True, room_classes=room_classes)).solve())
+        check(f"seed {seed}, room symmetry", result, data, domain, blocks, custom)
+
+        # Out of budget after a few nodes: the partial timetable must still be clash-free
+        solver = CSP(sections, domain, constraints, data["lecturers"], **args(forward_checking=True, max_nodes=5))
+        result = quietly(lambda: solver.solve(allow_partial=True))
+        check(f"seed {seed}, partial result", result, data, domain, blocks, custom, complete=False)
+
+        result = quietly(lambda: MinConflictsSolver(sections, domain, constraints, data["lecturers"],
+                                                    **args()).solve())
+        check(f"seed {seed}, local search", result, data, domain, blocks, custom)
+        result = quietly(lambda: TwoPhaseSolver(sections, domain, constraints, data["lecturers"], data["rooms"],
+                                                **args(forward_checking=True, arc_consistency=True,
+                                                       backjumping=True)).solve())
+        check(f"seed {seed}, two-phase", result, data, domain, blocks, custom)
+
+        problem = {"sections": sections, "domains": domain, "lecturers": data["lecturers"], "rooms": data["rooms"],
+                   "preferences": preferences, "blocked_blocks": blocks, "exam_mode": False,
+                   "room_classes": room_classes}
+        result = quietly(lambda: solve_portfolio(problem, 2, timeout_seconds=10, seed=seed))
+        check(f"seed {seed}, portfolio", result, data, domain, blocks, custom)
+        result = quietly(lambda: solve_components(problem, constraints, timeout_seconds=10, seed=seed))
+        check(f"seed {seed}, decompose", result, data, domain, blocks, custom)
+
+        # Warm start from the first timetable with every third section moved to its first value
+        base = quietly(lambda: CSP(sections, domain, constraints, data["lecturers"],
+                                   **args(forward_checking=True)).solve())
+        if isinstance(base, dict):
+            previous = dict(base)
+            for var_id in list(previous)[::3]:
+                previous[var_id] = domain[var_id][0]
+            solver = CSP(sections, domain, constraints, data["lecturers"], **args(forward_checking=True))
+            base = quietly(lambda: repair_schedule(solver, previous, log=lambda message: None))
+        check(f"seed {seed}, repair", base, data, domain, blocks, custom)
+
+    for seed in (1, 2):
+        data, _, _ = random_problem(seed, exam_mode=True)
+        sections = data["sections"]
+        domain = build_exam_domain(data)
+        constraints = make_exam_constraints(sections, data["rooms"])
+        print(f"\nExam instance {seed}...")
+        for name in ("chronological", "backjumping + FC + AC-3 + luby restarts"):
+            options = {"seed": seed, **CSP_OPTIONS[name]}
+            result = quietly(lambda: CSP(sections, domain, constraints, data["lecturers"], log_file=os.devnull,
+                                         timeout_seconds=10, **options).solve())
+            check(f"exam seed {seed}, {name}", result, data, domain, exam_mode=True)
+
+    print(f"\n{failures} failure(s).")
+    return failures
+
+
+if __name__ == "__main__":
+    sys.exit(1 if run_all() else 0)